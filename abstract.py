@@ -1,11 +1,212 @@
+import pygame
 import pygame.image
 import pygame.rect
+import pygame.transform
+import os
 import os.path
+import bisect
+import collections
+import bundle
 from general import SolSet
 
-def loadImage(name) :
-	image =  pygame.image.load(os.path.join(SolSet.image_path, name + SolSet.image_type))
-	return image.convert_alpha()
+#Every image is decoded once and then shared by all the objects (and games) in the process
+#The images are keyed by the cardset they come from (SolSet.image_path) and their name
+#When the cardset has a bundle (see bundle.py), the images are taken from it rather than decoded
+image_cache = {}
+bundles = {} #The bundle of each cardset used (None if it has none)
+
+#How much bigger than the cardset the table is drawn (see Game.fitTable)
+image_scale = 1.0
+
+#A length on the table at the current scale
+def scaled(value) :
+	return int(round(value * image_scale))
+
+def scaledSize(size) :
+	return (max(1, scaled(size[0])), max(1, scaled(size[1])))
+
+
+#Scaled copies of the images, for a table that is not drawn at the size of the cardset
+#The copies are keyed by (cardset, name, size) and hold at most max_bytes of pixels, the least recently used are dropped first
+#With a directory, scaled images are kept on disk as well, so the next run at that size does not have to scale them again
+class ScaledCache(object) :
+	def __init__(self, max_bytes, directory = None) :
+		self.max_bytes = max_bytes
+		self.directory = directory
+		self.images = collections.OrderedDict()
+		self.bytes = 0
+		self.evictions = 0
+
+	def get(self, cardset, name, image, size) :
+		key = (cardset, name, size)
+		scaled_image = self.images.get(key)
+		if scaled_image is not None :
+			self.images.move_to_end(key)
+			return scaled_image
+
+		scaled_image = self.readDisk(key)
+		if scaled_image is None :
+			scaled_image = pygame.transform.smoothscale(image, size)
+			self.writeDisk(key, scaled_image)
+
+		self.images[key] = scaled_image
+		self.bytes += size[0] * size[1] * 4
+		while self.bytes > self.max_bytes and len(self.images) > 1 :
+			(old_cardset, old_name, old_size), old_image = self.images.popitem(last = False)
+			self.bytes -= old_size[0] * old_size[1] * 4
+			self.evictions += 1
+		return scaled_image
+
+	#Forget the scaled images of a cardset (or of all cardsets), the disk cache is left alone
+	def clear(self, cardset = None) :
+		for key in list(self.images) :
+			if cardset is None or key[0] == cardset :
+				del self.images[key]
+				self.bytes -= key[2][0] * key[2][1] * 4
+
+	def diskPath(self, key) :
+		cardset, name, size = key
+		cardset = os.path.basename(os.path.abspath(cardset))
+		return os.path.join(self.directory, cardset, '%dx%d' % size, name + '.bgra')
+
+	#The pixels are kept in the byte order of convert_alpha, like in a cardset bundle
+	def readDisk(self, key) :
+		if not self.directory : return None
+		try :
+			with open(self.diskPath(key), 'rb') as pixels : data = bytearray(pixels.read())
+		except (IOError, OSError) :
+			return None
+		if len(data) != key[2][0] * key[2][1] * 4 : return None
+		return pygame.image.frombuffer(data, key[2], 'BGRA')
+
+	def writeDisk(self, key, image) :
+		if not self.directory : return
+		path = self.diskPath(key)
+		try :
+			if not os.path.isdir(os.path.dirname(path)) : os.makedirs(os.path.dirname(path))
+			with open(path + '.tmp', 'wb') as pixels : pixels.write(pygame.image.tostring(image, 'BGRA'))
+			os.replace(path + '.tmp', path)
+		except (IOError, OSError) :
+			pass #The disk cache only saves time, the image is still there
+
+#The cache is only made when the first image is scaled, so the SolSet.scale_cache_ settings made before that are the ones used
+scaled_cache = None
+
+def scaledCache() :
+	global scaled_cache
+	if scaled_cache is None : scaled_cache = ScaledCache(SolSet.scale_cache_bytes, SolSet.scale_cache_dir)
+	return scaled_cache
+
+#The image at the current scale, or at size if one is given
+def loadImage(name, size = None) :
+	image = decodeImage(name)
+	if size is None :
+		if image_scale == 1.0 : return image
+		size = scaledSize(image.get_size())
+	if size == image.get_size() : return image
+	return scaledCache().get(SolSet.image_path, name, image, size)
+
+#The image at the size of the cardset
+def decodeImage(name) :
+	key = (SolSet.image_path, name)
+	image = image_cache.get(key)
+	if image is None :
+		cardset = cardsetBundle(SolSet.image_path)
+		if cardset and name in cardset : image = cardset.surface(name)
+		else :
+			path = os.path.join(SolSet.image_path, name + SolSet.image_type)
+			#Images a cardset does not have (like the pile bottoms) are the ones of the table
+			if not os.path.exists(path) : path = os.path.join(SolSet.table_path, name + SolSet.table_type)
+			image =  pygame.image.load(path)
+			image = image.convert_alpha()
+		image_cache[key] = image
+	return image
+
+def cardsetBundle(cardset) :
+	if not SolSet.image_bundle : return None
+	if cardset not in bundles : bundles[cardset] = bundle.openBundle(cardset)
+	return bundles[cardset]
+
+#Decode images ahead of time, so the first deal does not have to
+def preloadImages(names) :
+	for name in names : loadImage(name)
+
+#Forget the decoded images of a cardset (or of all cardsets), for example after the image files changed
+def clearImages(cardset = None) :
+	if scaled_cache is not None : scaled_cache.clear(cardset)
+	if cardset is None :
+		image_cache.clear()
+		bundles.clear()
+		return
+	for key in list(image_cache) :
+		if key[0] == cardset : del image_cache[key]
+	bundles.pop(cardset, None)
+
+
+#Collects the areas of the screen that changed and need to be drawn again (see Game.render)
+#Nothing is collected unless it is enabled
+class DirtyRects(object) :
+	def __init__(self) :
+		self.enabled = False
+		self.rects = []
+
+	def mark(self, rect) :
+		if self.enabled : self.rects.append(pygame.Rect(rect))
+
+	#Returns the changed areas (overlapping areas are merged) and starts collecting again
+	def take(self) :
+		merged = []
+		for rect in self.rects :
+			i = rect.collidelist(merged)
+			while i != -1 :
+				rect = rect.union(merged.pop(i))
+				i = rect.collidelist(merged)
+			merged.append(rect)
+		self.rects = []
+		return merged
+
+dirty = DirtyRects()
+
+
+#A grid over the screen that finds the pile at a point without going through all the piles
+#Every object is put into the grid cells its rect touches, and is moved between cells when its rect changes (see update)
+#An object can stand in for an owner, so a click on one of the piles of an AbstractMultiPile finds the multi pile
+class SpatialIndex(object) :
+	def __init__(self, cell_size) :
+		self.cell_w, self.cell_h = cell_size
+		self.cells = {} #The objects in each (column, row) cell
+		self.placed = {} #The cells each object is in
+		self.owners = {}
+
+	def cellsOf(self, rect) :
+		left, top = rect.left // self.cell_w, rect.top // self.cell_h
+		right, bottom = (rect.right - 1) // self.cell_w, (rect.bottom - 1) // self.cell_h
+		return [(x, y) for x in range(left, max(left, right) + 1) for y in range(top, max(top, bottom) + 1)]
+
+	def add(self, obj, owner = None) :
+		self.owners[obj] = owner if owner is not None else obj
+		obj.grid = self
+		self.update(obj)
+
+	#Has to be called whenever the rect of an object changes
+	def update(self, obj) :
+		for key in self.placed.get(obj, []) : self.cells[key].remove(obj)
+		keys = self.cellsOf(obj.rect)
+		for key in keys : self.cells.setdefault(key, []).append(obj)
+		self.placed[obj] = keys
+
+	#The owner of the object at pos (None if there is nothing there)
+	def find(self, pos) :
+		for obj in self.cells.get((pos[0] // self.cell_w, pos[1] // self.cell_h), []) :
+			if obj.hasPosition(pos) : return self.owners[obj]
+
+	#The owners of all the objects that overlap rect
+	def collide(self, rect) :
+		found = set()
+		for key in self.cellsOf(rect) :
+			for obj in self.cells.get(key, []) :
+				if obj.rect.colliderect(rect) : found.add(self.owners[obj])
+		return found
 
 
 #Basic class on which all the other classes will depend
@@ -29,11 +230,16 @@ class AbstractObject(object) :
 		return (self.rect.x, self.rect.y)
 
 	#Moving objects might not be as easy as chaing rect.x, so use subclass this if necessary
+	#Both where the object was and where it is now have to be drawn again
 	def setPosition(self, pos) :
+		dirty.mark(self.rect)
 		self.rect.x, self.rect.y = pos[0], pos[1]
+		dirty.mark(self.rect)
 
 	def movePosition(self, move) :
+		dirty.mark(self.rect)
 		self.rect.move_ip(move)
+		dirty.mark(self.rect)
 
 
 #An object that has an image associated with it
@@ -42,14 +248,19 @@ class AbstractImage(AbstractObject) :
 	def __init__(self, name, pos, image) :
 		AbstractObject.__init__(self, name, pos)
 		#All objects have an image (surface) associated with them.
+		self.image_name = image
 		self.image = self.setImage(image) 
 		#Will this object be drawn (allows me to easily hide objects, rather than move rect off-screen)
 		self.visible = True
 
 	#The simple draw function that needs subclassed to be usefull
 	def draw(self, screen) :
+		self.drawAt(screen, self.rect)
+
+	#Draw the object somewhere else than where it is (like onto a surface that several objects are drawn onto)
+	def drawAt(self, screen, pos) :
 		if self.visible :
-			screen.blit(image, self.rect)
+			screen.blit(self.image, pos)
 
 	#Each object is associated with an image. As soon as the image is loaded, the self.rect attribute needs to be updated
 	def setImage(self, image) :
@@ -57,15 +268,39 @@ class AbstractImage(AbstractObject) :
 		self.rect.w, self.rect.h = loaded.get_width(), loaded.get_height()
 		return loaded
 
+	#Load the image again, at the current scale
+	def rescale(self) :
+		dirty.mark(self.rect)
+		self.image = self.setImage(self.image_name)
+		dirty.mark(self.rect)
+
 
 #The basic container for cards. Subsequent piles will subclass it 
 #The image represents the empty pile
 class AbstractPile(AbstractImage) :
+	#Are the bottoms of the piles drawn by a background layer (see Game.drawBackground) rather than by the piles
+	bottom_layer = False
 
 	def __init__(self, name, pos, image, cards = []) :
 		AbstractImage.__init__(self, name, pos, image)
+		self.grid = None #The SpatialIndex the pile is in, which needs to know when the pile moves or changes size
+		self.placed = True #Are the rects of the cards where the pile is (moving the pile leaves them behind until place is called)
 		self.cards = []
 		self.addCards(cards)
+		#The rules engine (see engine.py) this pile is a view of and the number of the pile in it
+		self.state = None
+		self.index = None
+
+	#The bottom is drawn the size of the cards, even when it comes from the table rather than the cardset
+	def setImage(self, image) :
+		loaded = loadImage(image, scaledSize(SolSet.image_resolution))
+		self.rect.w, self.rect.h = loaded.get_width(), loaded.get_height()
+		return loaded
+
+	#Link this pile to its pile in a rules engine
+	def bind(self, state, index) :
+		self.state = state
+		self.index = index
 
 	#Are there any cards in the pile?
 	def isEmpty(self) : 
@@ -80,13 +315,50 @@ class AbstractPile(AbstractImage) :
 		for card in self.cards :
 			card.faceUp = boolean
 
+	#Put the rects of the cards back on the pile after it was moved
+	#In this pile all the cards are exactly on top of the pile
+	def place(self) :
+		if self.placed : return
+		for card in self.cards : card.rect.topleft = self.rect.topleft
+		self.placed = True
+
+	#Load the images of the pile and its cards again, at the current scale
+	def rescale(self) :
+		super(AbstractPile, self).rescale()
+		for card in self.cards : card.rescale()
+		self.placed = False
+		if self.grid : self.grid.update(self)
+
+	#Can the rules put these cards on this pile, wherever they are on the screen (see validAddCards)
+	def canAddCards(self, cards) :
+		return False
+
+	#Are the cards over the part of this pile they can be dropped on
+	def touchesCards(self, cards) :
+		return self.hasCollision(cards[0])
+
+	#The part of the pile that cards are dropped on (the top card, or the pile itself when empty)
+	def dropRect(self) :
+		if self.isEmpty() : return self.rect
+		self.place()
+		return self.cards[-1].rect
+
 	#Draws the bottom symbol stored in self.image (generally used to show an empty pile)
 	def drawBottom(self, screen) :
-		screen.blit(self.image, self.rect)
+		if not AbstractPile.bottom_layer : screen.blit(self.image, self.rect)
+
+	#Draws the bottom into the background layer
+	def drawLayer(self, layer) :
+		if self.visible : layer.blit(self.image, self.rect)
+
+	#A card of the pile changed how it looks (it was turned over)
+	def cardChanged(self, card) :
+		pass
 
 	#Remove cards from the top of the pile (end of the list)
 	def takeCards(self, num) :
 		 if num > self.cardNum() or num < 0 : raise IndexError
+		 self.place() #The cards taken have to be where they are seen
 		 break_point = self.cardNum() - num
 		 to_take = self.cards[break_point : ] #Cards that are taken
 		 self.cards = self.cards [ : break_point] #Cards that remain
@@ -98,15 +370,14 @@ class AbstractPile(AbstractImage) :
 	#The setPosition function moves all the cards, rather than setting the position directly
 	#This allows tiled piles to be set correctly, as using setPosition directly would make the tiled pile into simple pile 
 	def setPosition(self, pos) :
-		x_move = pos[0] - self.rect.x
-		y_move = pos[1] - self.rect.y
-
-		super(AbstractPile, self).setPosition(pos)
-		for card in self.cards : card.movePosition((x_move, y_move))
+		self.movePosition((pos[0] - self.rect.x, pos[1] - self.rect.y))
 
+	#Only the pile itself is moved, the cards follow when they are next needed (see place)
+	#The rect of the pile covers all its cards, so marking it dirty covers the cards as well
 	def movePosition(self, move) :
 		super(AbstractPile, self).movePosition(move)
-		for card in self.cards : card.movePosition(move)
+		if self.cards : self.placed = False
+		if self.grid : self.grid.update(self)
 
 	#Simple function that takes cards and puts them back
 	def returnCards(self, cards) :
@@ -136,6 +407,7 @@ class AbstractSimplePile(AbstractPile) :
 			self.drawBottom(screen)
 
 		else :
+			self.place()
 			self.cards[-1].draw(screen)
 
 	#Can a cards be added to this pile by the user (for this class, always no)
@@ -161,38 +433,102 @@ class AbstractTilePile(AbstractPile) :
 	def __init__(self, name, pos, image, init_space, add_space, cards = []) :
 		self.init_space = init_space
 		self.add_space = add_space
+		self.offsets = [] #How far below the top of the pile each card is (in the same order as self.cards)
+		self.surface = None #All the cards drawn onto one surface (with SolSet.cached_layers), None when it has to be drawn again
 		AbstractPile.__init__(self, name, pos, image, cards)
 
+	#With SolSet.cached_layers the whole pile is a single blit of self.surface, which is only drawn again after the pile changed
 	def draw(self, screen) :
 		if not self.visible : return
-		if self.isEmpty(): self.drawBottom(screen)
+		if self.isEmpty() :
+			self.drawBottom(screen)
+			return
+
+		if SolSet.cached_layers :
+			if self.surface is None : self.surface = self.composite()
+			screen.blit(self.surface, self.rect)
+			return
+
+		self.place()
 		for card in self.cards : card.draw(screen)
 
+	#The cards of the pile drawn onto a surface the size of the pile
+	#The surface is opaque, with the table showing through the corners of the cards (the cards blended twice would not look the same when scaled)
+	def composite(self) :
+		surface = pygame.Surface(self.rect.size).convert()
+		surface.fill((0, 0, 0))
+		for card, offset in zip(self.cards, self.offsets) : card.drawAt(surface, (0, offset))
+		return surface
+
+	def cardChanged(self, card) :
+		self.surface = None
+
 	#Can a cards be added to this pile by the user (for this class, always no)
 	def validAddCards(self, pile) :
 		return False
 
+	#The cards are placed relative to the top of the pile, see layout
+	def place(self) :
+		if self.placed : return
+		x, y = self.rect.x, self.rect.y
+		for card, offset in zip(self.cards, self.offsets) : card.rect.topleft = (x, y + offset)
+		self.placed = True
+
+	#How far below the top of the pile each of cards would go if they were added to it
 	#This function is a little strained as it has to determine if a card is being added by the user
 	#Or if cards are being returned to a pristine tiled pile
 	#This is to ensure that the tile spacing does arbitarily switch
-	def addSingle(self, card) :
-		if self.isEmpty() :
-			card.setPosition((self.rect.x, self.rect.y))
-		else :
-			last_card = self.cards[-1]
-			#If the last card is faceUp, add the card with add_space spacing
-			if last_card.faceUp : card.setPosition((last_card.rect.x, last_card.rect.y + self.add_space))
-			#If the last card is faceDown, it means the card should be added with the init_space
-			else : card.setPosition((last_card.rect.x, last_card.rect.y + self.init_space))
+	def layout(self, cards) :
+		offsets = []
+		if self.isEmpty() : below, offset = None, 0
+		else : below, offset = self.cards[-1], self.offsets[-1]
+		for card in cards :
+			if below is not None :
+				#If the card below is faceUp, add the card with add_space spacing
+				#If the card below is faceDown, it means the card should be added with the init_space
+				offset += self.add_space if below.faceUp else self.init_space
+			offsets.append(offset)
+			below = card
+		return offsets
 
-		card.pile = self
-		self.cards.append(card)
-		self.updateArea() #Don't forget to update the new area
+	def addSingle(self, card) :
+		self.addCards([card])
 
 	#Add cards to this pile
+	#All the cards are laid out in one go and the area is only updated once
 	#If you just want to know if cards could be added by user, run validAddPile
 	def addCards(self, cards) :
-		for card in cards : self.addSingle(card)
+		if not cards : return
+		self.place()
+		offsets = self.layout(cards)
+		x, y = self.rect.x, self.rect.y
+		for card, offset in zip(cards, offsets) :
+			card.setPosition((x, y + offset))
+			card.pile = self
+		self.cards.extend(cards)
+		self.offsets.extend(offsets)
+		self.surface = None
+		self.updateArea() #Don't forget to update the new area
+
+	def rescale(self) :
+		super(AbstractTilePile, self).rescale()
+		self.surface = None
+		self.updateArea()
+
+	#Change the spacing of the cards
+	#Cards that were init_space apart are the new init_space apart, the others the new add_space
+	def setSpacing(self, init_space, add_space) :
+		offsets = []
+		for i, offset in enumerate(self.offsets) :
+			if i == 0 : offsets.append(0)
+			elif offset - self.offsets[i - 1] == self.init_space : offsets.append(offsets[-1] + init_space)
+			else : offsets.append(offsets[-1] + add_space)
+		self.init_space = init_space
+		self.add_space = add_space
+		self.offsets = offsets
+		self.placed = False
+		self.surface = None
+		self.updateArea()
 
 	#The rect area actually gets bigger as more cards are added, so it needs to be updated
 	def updateArea(self) :
@@ -200,15 +536,26 @@ class AbstractTilePile(AbstractPile) :
 			ref = self.image.get_rect()
 			self.rect.h= ref.h
 
-		else : #The hight of the tiled pile is simply the difference between the top of first and bottom of last card
-			bottom = self.cards[-1].rect.bottom
-			top = self.cards[0].rect.top
-			self.rect.h = bottom - top
+		else : #The hight of the tiled pile is simply the offset of the last card plus its height
+			self.rect.h = self.offsets[-1] + self.cards[-1].rect.h
+		if self.grid : self.grid.update(self)
+
+	#The index of the top most card at pos (-1 if there is no card there)
+	#The cards are in order from top to bottom of the pile, so the last card that starts above pos is the only one to check
+	#Only the offsets are needed, so the cards do not have to be placed
+	def cardAt(self, pos) :
+		if not self.cards or not self.hasPosition(pos) : return -1
+		y = pos[1] - self.rect.y
+		i = bisect.bisect_right(self.offsets, y) - 1
+		if i >= 0 and y < self.offsets[i] + self.cards[i].rect.h : return i
+		return -1
 
 	#Remove cards from the top of the pile (end of the list)
 	#Had to be subclassed to ensure the area is correctly updated
 	def takeCards(self, num) :
 		result = super(AbstractTilePile, self).takeCards(num)
+		del self.offsets[self.cardNum() : ]
+		self.surface = None
 		self.updateArea()
 		return result
 
@@ -229,6 +576,17 @@ class AbstractMultiPile(AbstractObject) :
 		new_pile.setPosition((self.rect.x + displace, self.rect.y))
 		self.piles.append(new_pile)
 
+	#Put the piles next to each other again (after they changed size or self.space changed)
+	def arrange(self) :
+		x = self.rect.x
+		for pile in self.piles :
+			pile.setPosition((x, self.rect.y))
+			x += pile.rect.width + self.space
+
+	def rescale(self) :
+		for pile in self.piles : pile.rescale()
+		self.arrange()
+
 	#Is a pile located at that position (return None if there is nothing)
 	def getPile(self, pos) :
 		for pile in self.piles :
@@ -0,0 +1,127 @@
+#Solves a lot of seeded deals on all cores and writes what the solver found out about each one
+#python batch.py results.txt --range 0 1000000
+#python batch.py results.txt --file seeds.txt --workers 8 --max-nodes 100000
+#python batch.py results.txt --range 0 1000 --memo positions.memo      keep the verdicts in a memo (see memo.py) that later runs and the game can use
+#python batch.py results.txt --range 0 1000 --variant vegas            deal another variant than Klondike (see variants.py)
+#Each line of the results is: seed verdict nodes seconds moves (moves is 0 unless the deal is winnable, see solver.py for the verdicts)
+#Lines are appended as soon as a deal is solved, so running the same command again carries on where it stopped
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import engine
+import memo
+import solver
+import variants
+
+#Workers leave Ctrl-C to the main process, which stops the pool
+def ignoreInterrupt() :
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+#Solve a chunk of seeds (this runs in the worker processes)
+#With a variant (its name), the deals are that variant's and draw is not used
+def solveSeeds(seeds, draw, max_nodes, max_time, memo_path = None, variant = None) :
+	results = []
+	store = memo.Memo(memo_path) if memo_path else None
+	variant = variants.variant(variant) if variant else None
+	for seed in seeds :
+		codes = engine.shuffled(seed)
+		state = variant.deal(codes) if variant else engine.Klondike.deal(codes, draw)
+		result = solver.solve(state, max_nodes, max_time, memo = store)
+		moves = len(result.moves) if result.moves else 0
+		results.append('%d %s %d %.4f %d\n' % (seed, result.verdict, result.nodes, result.seconds, moves))
+	if store : store.close()
+	return results
+
+#The seeds that already have a result in the output file
+def solvedSeeds(path) :
+	done = set()
+	if not os.path.exists(path) : return done
+	with open(path) as results :
+		for line in results :
+			fields = line.split()
+			if line.endswith('\n') and len(fields) == 5 : done.add(int(fields[0])) #Skip lines cut off by an interrupted run
+	return done
+
+#Read the seeds to solve, one at a time
+def readSeeds(args) :
+	if args.file :
+		with open(args.file) as seeds :
+			for line in seeds :
+				if line.strip() : yield int(line)
+	else :
+		for seed in range(args.range[0], args.range[1]) : yield seed
+
+#Group seeds into chunks, leaving out the ones that are already solved
+def chunks(seeds, done, size) :
+	chunk = []
+	for seed in seeds :
+		if seed in done : continue
+		chunk.append(seed)
+		if len(chunk) == size :
+			yield chunk
+			chunk = []
+	if chunk : yield chunk
+
+#Open the output file for appending, finishing off a line an interrupted run only half wrote
+def openResults(path) :
+	output = open(path, 'a+')
+	output.seek(0, os.SEEK_END)
+	if output.tell() :
+		output.seek(output.tell() - 1)
+		if output.read(1) != '\n' : output.write('\n')
+	return output
+
+#Small chunks go out to whichever worker is free next, so a few hard deals only hold up the worker solving them
+#Only a few chunks per worker are handed out ahead, so the seeds are read as the run goes rather than all up front
+def run(args) :
+	done = solvedSeeds(args.output)
+	if args.memo : memo.Memo(args.memo).close() #Made before the workers start, so they do not race to make it
+	output = openResults(args.output)
+	pool = multiprocessing.Pool(args.workers, ignoreInterrupt)
+	window = threading.BoundedSemaphore(args.workers * 4)
+	failures = []
+
+	def finished(lines) :
+		output.writelines(lines)
+		output.flush()
+		window.release()
+
+	def failed(error) :
+		failures.append(error)
+		window.release()
+
+	try :
+		for chunk in chunks(readSeeds(args), done, args.chunk) :
+			window.acquire()
+			if failures : break
+			pool.apply_async(solveSeeds, (chunk, args.draw, args.max_nodes, args.max_time, args.memo, args.variant), callback = finished, error_callback = failed)
+		pool.close()
+		pool.join()
+	except KeyboardInterrupt :
+		pool.terminate()
+		pool.join()
+	finally :
+		output.close()
+
+	if failures : raise failures[0]
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'Solve seeded Klondike deals in parallel')
+	parser.add_argument('output', help = 'results file, appended to')
+	seeds = parser.add_mutually_exclusive_group(required = True)
+	seeds.add_argument('--range', type = int, nargs = 2, metavar = ('FIRST', 'END'), help = 'seeds FIRST up to (not including) END')
+	seeds.add_argument('--file', help = 'file with one seed per line')
+	parser.add_argument('--workers', type = int, default = multiprocessing.cpu_count())
+	parser.add_argument('--chunk', type = int, default = 16, help = 'seeds handed to a worker at once')
+	parser.add_argument('--draw', type = int, default = 1, help = 'cards turned from the stock at once')
+	parser.add_argument('--variant', choices = variants.NAMES, help = 'deal this variant (which says how many cards are drawn) rather than Klondike')
+	parser.add_argument('--max-nodes', type = int, default = 100000, help = 'search budget per deal')
+	parser.add_argument('--max-time', type = float, default = None, help = 'seconds allowed per deal')
+	parser.add_argument('--memo', metavar = 'FILE', help = 'position memo to look deals up in and keep the verdicts in')
+	return parser.parse_args(argv)
+
+if __name__ == "__main__":
+	run(parseArgs(sys.argv[1 : ]))
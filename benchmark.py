@@ -0,0 +1,229 @@
+#Times the pile operations, rule checks and drawing the game is built from, without a window (SDL's dummy video driver)
+#python benchmark.py                                 run everything and print the times
+#python benchmark.py --save baseline.json            and keep them as a baseline
+#python benchmark.py --compare baseline.json         and report everything that got slower than the baseline by more than --threshold
+#Each time is the best of --repeat runs, where a run calls the operation as often as fits into --min-time seconds
+#Compare exits with 1 if there is a regression, so it can be used as a check
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import pygame
+import engine
+from general import SolSet
+from objects import *
+import game
+
+SEED = 1 #Every benchmark plays the same deal
+ENGINE_MOVES = 200 #The moves made in the rules engine by one call of the apply and undo benchmark
+
+#The benchmarks in the order they are run
+#A benchmark gets the Game to work on and returns setup and op: setup is called (untimed) before every call of op, and what it returns is passed to op
+BENCHMARKS = []
+
+def benchmark(name) :
+	def register(function) :
+		BENCHMARKS.append((name, function))
+		return function
+	return register
+
+#A tiled pile of num faceup cards, away from the piles of the game
+def tilePile(game, num) :
+	cards = game.cards[ : num]
+	pile = MainPile('Bench', (0, 0), SolSet.image_bottom, SolSet.tile_small_space, SolSet.tile_large_space, cards)
+	pile.allFaceUp(True)
+	return pile
+
+#The first move between two piles of the game that the rules engine allows and that meets the condition
+def findMove(game, condition) :
+	for move in game.state.moves() :
+		if not engine.isFlip(move) and condition(engine.source(move), engine.dest(move)) : return move
+	return None
+
+#The pile of the game bound to a pile number of the rules engine
+def gamePile(game, index) :
+	for pile in game.piles :
+		if isinstance(pile, StartPile) :
+			if index == engine.STOCK : return pile.piles[StartPile.DRAW]
+			if index == engine.WASTE : return pile.piles[StartPile.DISCARD]
+		elif pile.index == index : return pile
+
+#Put the cards a move would drag over the pile they go to, as if the player was about to let go of them
+def dragOver(game, move) :
+	src = gamePile(game, engine.source(move))
+	dst = gamePile(game, engine.dest(move))
+	cards = src.cards[-engine.number(move) : ]
+	dst.place()
+	target = dst.cards[-1].rect if dst.cards else dst.rect
+	cards[0].setPosition((target.x + 5, target.y + 5))
+	return dst, cards
+
+@benchmark('AbstractPile.takeCards')
+def takeCards(game) :
+	return (lambda : tilePile(game, 13)), (lambda pile : pile.takeCards(6))
+
+@benchmark('AbstractTilePile.addCards')
+def addCards(game) :
+	def setup() :
+		pile = tilePile(game, 7)
+		return pile, game.cards[7 : 13]
+	return setup, (lambda args : args[0].addCards(args[1]))
+
+@benchmark('AbstractTilePile.updateArea')
+def updateArea(game) :
+	pile = tilePile(game, 13)
+	return (lambda : pile), (lambda pile : pile.updateArea())
+
+#The drop of a run of cards onto a tableau column that takes it
+@benchmark('MainPile.validAddCards')
+def mainValidAdd(game) :
+	move = findMove(game, lambda src, dst : src < engine.STOCK and dst < engine.STOCK)
+	if move is None : move = findMove(game, lambda src, dst : dst < engine.STOCK)
+	dst, cards = dragOver(game, move)
+	return (lambda : cards), (lambda cards : dst.validAddCards(cards))
+
+#The drop of a card onto a foundation that takes it
+#The deal of SEED has no card for the foundations, so the first deal after it that does is played
+@benchmark('SuitPile.validAddCards')
+def suitValidAdd(game) :
+	seed = SEED
+	move = None
+	while move is None :
+		seed += 1
+		game.cards = game.loadCards(seed)
+		game.piles = game.populatePiles()
+		move = findMove(game, lambda src, dst : dst >= engine.FOUNDATION)
+	dst, cards = dragOver(game, move)
+	return (lambda : cards), (lambda cards : dst.validAddCards(cards))
+
+#Turning up every card of the stock and turning the waste back over
+@benchmark('StartPile.drawUpClick (whole stock)')
+def drawCycle(game) :
+	def setup() :
+		game.piles = game.populatePiles()
+		return game.piles[7]
+	def op(start) :
+		for i in range(len(game.state.piles[engine.STOCK]) + 1) : start.drawUpClick()
+	return setup, op
+
+#Making the moves of a game in the rules engine and taking them all back again, as the solver does
+#The moves are random legal ones from the deal of SEED, with a random generator seeded by SEED so every run makes the same ones
+@benchmark('Klondike.apply + undo (%d moves)' % ENGINE_MOVES)
+def applyUndo(game) :
+	state = game.state.copy()
+	rng = random.Random(SEED)
+	moves = []
+	for i in range(ENGINE_MOVES) :
+		moves.append(rng.choice(state.moves()))
+		state.apply(moves[-1])
+	backwards = moves[ : : -1]
+	for move in backwards : state.undo(move)
+	def op(state) :
+		for move in moves : state.apply(move)
+		for move in backwards : state.undo(move)
+	return (lambda : state), op
+
+@benchmark('Game.populatePiles')
+def populatePiles(game) :
+	return (lambda : game), (lambda game : game.populatePiles())
+
+@benchmark('Game.loadCards')
+def loadCards(game) :
+	return (lambda : game), (lambda game : game.loadCards(SEED))
+
+#A whole frame as Game.render draws it without dirty rects (the dummy display is not flipped)
+@benchmark('Game.draw (full frame)')
+def drawFrame(game) :
+	return (lambda : game), (lambda game : game.draw())
+
+#Seconds per call of op, the best of repeat runs of number calls
+def timeOp(setup, op, number, repeat) :
+	best = None
+	for run in range(repeat) :
+		total = 0.0
+		for i in range(number) :
+			args = setup()
+			start = time.perf_counter()
+			op(args)
+			total += time.perf_counter() - start
+		if best is None or total < best : best = total
+	return best / number
+
+#How many calls of op fit into min_time seconds (at least one)
+def calibrate(setup, op, min_time) :
+	number = 1
+	while True :
+		if timeOp(setup, op, number, 1) * number >= min_time or number >= 1 << 20 : return number
+		number *= 2
+
+def runAll(args) :
+	results = {}
+	for name, function in BENCHMARKS :
+		if args.filter and args.filter not in name : continue
+		SolSet.dirty_rects = False
+		play = game.Game(SEED)
+		setup, op = function(play)
+		number = calibrate(setup, op, args.min_time)
+		seconds = timeOp(setup, op, number, args.repeat)
+		results[name] = {'seconds' : seconds, 'number' : number, 'repeat' : args.repeat}
+		print('%-40s %12.2f us' % (name, seconds * 1e6))
+	pygame.quit()
+	return {
+		'python' : platform.python_version(),
+		'pygame' : pygame.version.ver,
+		'machine' : platform.machine(),
+		'created' : time.strftime('%Y-%m-%d %H:%M:%S'),
+		'benchmarks' : results,
+	}
+
+#Print how every benchmark changed against the baseline
+#Returns the names of the benchmarks that got slower by more than threshold (0.1 is 10% slower)
+def compare(baseline, current, threshold) :
+	regressions = []
+	print('')
+	print('%-40s %12s %12s %8s' % ('', 'baseline', 'now', 'change'))
+	for name, result in current['benchmarks'].items() :
+		base = baseline['benchmarks'].get(name)
+		if base is None :
+			print('%-40s %12s %10.2fus %8s' % (name, '-', result['seconds'] * 1e6, 'new'))
+			continue
+		change = result['seconds'] / base['seconds'] - 1
+		flag = ''
+		if change > threshold :
+			regressions.append(name)
+			flag = ' SLOWER'
+		print('%-40s %10.2fus %10.2fus %+7.1f%%%s' % (name, base['seconds'] * 1e6, result['seconds'] * 1e6, change * 100, flag))
+	return regressions
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'Benchmark the piles, rules checks and drawing of the game')
+	parser.add_argument('--save', metavar = 'FILE', help = 'write the results as a JSON baseline')
+	parser.add_argument('--compare', metavar = 'FILE', help = 'compare the results with a JSON baseline')
+	parser.add_argument('--threshold', type = float, default = 0.1, help = 'slowdown counted as a regression (0.1 is 10%%)')
+	parser.add_argument('--repeat', type = int, default = 5, help = 'runs per benchmark, the best one counts')
+	parser.add_argument('--min-time', type = float, default = 0.05, help = 'seconds each run takes at least')
+	parser.add_argument('--filter', help = 'only run the benchmarks with this in their name')
+	return parser.parse_args(argv)
+
+def main(argv) :
+	args = parseArgs(argv)
+	current = runAll(args)
+
+	if args.save :
+		with open(args.save, 'w') as output : json.dump(current, output, indent = 1, sort_keys = True)
+
+	if args.compare :
+		with open(args.compare) as baseline : regressions = compare(json.load(baseline), current, args.threshold)
+		if regressions :
+			print('\n%d regression(s) above %.0f%%' % (len(regressions), args.threshold * 100))
+			return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1 : ]))
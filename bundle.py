@@ -0,0 +1,104 @@
+#Packs the images of a cardset into one file of ready to use pixels, which the game maps into memory instead of decoding every image
+#python bundle.py cards                  writes cards/cardset.bundle
+#The cardset is described by its PySolFC config.txt, which gives the image type, the card size and the card backs
+#Layout of a bundle (little endian):
+#	header: MAGIC, number of images (uint32), card width and height from config.txt (uint16 each)
+#	one entry per image: name (32 bytes, zero padded), width and height (uint16 each), offset of the pixels in the file (uint32)
+#	the pixels of every image, 4 bytes per pixel in the byte order of pygame's convert_alpha (BGRA), each image starting on a 16 byte boundary
+#The surfaces are made straight from the mapped pages, so processes showing the same cardset share them
+import mmap
+import os
+import struct
+import sys
+import pygame
+
+MAGIC = b'SOLCARD1'
+BUNDLE_NAME = 'cardset.bundle'
+HEADER = struct.Struct('<8sIHH')
+ENTRY = struct.Struct('<32sHHI')
+FORMAT = 'BGRA'
+ALIGN = 16
+
+#What the config.txt of a PySolFC cardset says
+class Config(object) :
+	def __init__(self, path) :
+		with open(path) as config : lines = [line.strip() for line in config]
+		fields = lines[0].split(';')
+		if not fields[0].startswith('PySolFC solitaire cardset') : raise ValueError(path + ' is not a PySolFC cardset config')
+		self.version = int(fields[1])
+		self.ext = fields[2]
+		self.type = int(fields[3])
+		self.ncards = int(fields[4])
+		self.ident, self.name = lines[1].split(';')[ : 2]
+		self.width, self.height, self.depth = [int(value) for value in lines[2].split()]
+		self.xoffset, self.yoffset, self.xshadow, self.yshadow = [int(value) for value in lines[3].split()]
+		self.back = os.path.splitext(lines[4])[0] #The default back
+		self.backs = [os.path.splitext(back)[0] for back in lines[5 : ] if back]
+
+def readConfig(cardset) :
+	return Config(os.path.join(cardset, 'config.txt'))
+
+#The images of a cardset: every file of the type given in config.txt
+def imageNames(cardset, config) :
+	return sorted(os.path.splitext(name)[0] for name in os.listdir(cardset) if name.endswith(config.ext))
+
+#Decode every image of the cardset and write them to a bundle (pygame needs a display for convert_alpha, see main)
+def build(cardset, path = None) :
+	config = readConfig(cardset)
+	names = imageNames(cardset, config)
+	for back in config.backs :
+		if back not in names : raise ValueError('The back ' + back + ' of config.txt is missing')
+	if path is None : path = os.path.join(cardset, BUNDLE_NAME)
+
+	images = []
+	offset = HEADER.size + ENTRY.size * len(names)
+	for name in names :
+		image = pygame.image.load(os.path.join(cardset, name + config.ext)).convert_alpha()
+		offset += -offset % ALIGN
+		images.append((name, image.get_size(), offset, pygame.image.tostring(image, FORMAT)))
+		offset += len(images[-1][3])
+
+	with open(path, 'wb') as output :
+		output.write(HEADER.pack(MAGIC, len(images), config.width, config.height))
+		for name, size, offset, pixels in images : output.write(ENTRY.pack(name.encode('utf-8'), size[0], size[1], offset))
+		for name, size, offset, pixels in images :
+			output.write(b'\0' * (offset - output.tell()))
+			output.write(pixels)
+	return path
+
+
+#A bundle mapped into memory
+class Bundle(object) :
+	def __init__(self, path) :
+		with open(path, 'rb') as bundle : self.map = mmap.mmap(bundle.fileno(), 0, access = mmap.ACCESS_READ)
+		magic, count, self.width, self.height = HEADER.unpack_from(self.map, 0)
+		if magic != MAGIC : raise ValueError(path + ' is not a cardset bundle')
+		self.pixels = memoryview(self.map)
+		self.entries = {}
+		for i in range(count) :
+			name, width, height, offset = ENTRY.unpack_from(self.map, HEADER.size + i * ENTRY.size)
+			self.entries[name.rstrip(b'\0').decode('utf-8')] = (width, height, offset)
+
+	def __contains__(self, name) : return name in self.entries
+
+	#The image as a surface over the mapped pixels (nothing is copied)
+	def surface(self, name) :
+		width, height, offset = self.entries[name]
+		return pygame.image.frombuffer(self.pixels[offset : offset + width * height * 4], (width, height), FORMAT)
+
+#The bundle of a cardset, or None if it has none or it is older than the cardset
+#Adding or removing images or changing config.txt makes the bundle out of date (build it again after changing an image)
+def openBundle(cardset) :
+	path = os.path.join(cardset, BUNDLE_NAME)
+	try :
+		built = os.path.getmtime(path)
+		if built < os.path.getmtime(cardset) or built < os.path.getmtime(os.path.join(cardset, 'config.txt')) : return None
+		return Bundle(path)
+	except (OSError, ValueError, struct.error) :
+		return None
+
+if __name__ == "__main__":
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	pygame.init()
+	pygame.display.set_mode((1, 1))
+	for cardset in sys.argv[1 : ] : print(build(cardset))
@@ -0,0 +1,37 @@
+#The decks the game can be played with: every directory with a PySolFC config.txt (see bundle.Config) is a cardset
+#Finding the cardsets only reads their config.txt, no image is decoded until its cardset is selected and the image is drawn
+import os
+import bundle
+from general import SolSet
+
+class Cardset(object) :
+	def __init__(self, path) :
+		self.path = path
+		self.config = bundle.readConfig(path)
+		self.name = self.config.name
+
+	def __repr__(self) : return 'Cardset(' + self.path + ')'
+
+	#Load the images from this cardset from now on
+	#The card size, image type and back come from config.txt
+	def select(self) :
+		SolSet.image_path = self.path
+		SolSet.image_type = self.config.ext
+		SolSet.image_resolution = (self.config.width, self.config.height)
+		SolSet.image_back = self.config.back
+
+#The cardsets in directory (and directory itself if it is one), sorted by name
+def findCardsets(directory) :
+	paths = [directory] + [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+	found = []
+	for path in paths :
+		if os.path.isfile(os.path.join(path, 'config.txt')) :
+			try : found.append(Cardset(path))
+			except (ValueError, IndexError) : pass #Not a cardset config this can read
+	found.sort(key = lambda cardset : cardset.name)
+	return found
+
+#The cardset the images are loaded from now (None if SolSet.image_path has no config.txt)
+def current() :
+	if not os.path.isfile(os.path.join(SolSet.image_path, 'config.txt')) : return None
+	return Cardset(SolSet.image_path)
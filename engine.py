@@ -0,0 +1,328 @@
+#A display free model of Klondike, which the pygame objects in objects.py are a view over
+#Cards are small ints (0 - 51) in the order of general.cardNames(), so code >> 2 is the rank (0 is an ace) and code & 3 the suit
+#Piles are numbered: the seven tableau columns (MainPile) are 0 - 6, then the stock and waste (StartPile) and the four foundations (SuitPile)
+#Moves are ints as well, packed as source | dest << 4 | number << 8, so a move fits into two bytes
+#Which card may go where is looked up in the tables of a Rules (KLONDIKE unless a game is dealt by a variant, see variants.py)
+#Making a move and taking it back (apply and undo) takes about half a microsecond on one core, close to 2 million of each a second (see benchmark.py)
+import random
+from general import cardNames
+
+NAMES = cardNames()
+CODES = dict((name, code) for code, name in enumerate(NAMES))
+
+#Per card lookup tables (a list index is a lot cheaper than parsing the name)
+RANK = [code >> 2 for code in range(52)] #0 is an ace, 12 a king
+SUIT = [code & 3 for code in range(52)] #Same order as the suits in general.cardNames()
+COLOR = [(code & 3) >> 1 for code in range(52)] #Diamonds and hearts are 0, clubs and spades are 1
+
+RED = 0
+BLACK = 1
+ACE = 0
+KING = 12
+
+#The top card of an empty pile
+NONE = -1
+
+#Pile numbers
+TABLEAU = 0
+STOCK = 7
+WASTE = 8
+FOUNDATION = 9
+PILES = 13
+
+PILE_NAMES = ['Main' + str(i) for i in range(1, 8)] + ['Draw', 'Discard'] + ['Suit' + str(i) for i in range(1, 5)]
+
+#Packing and unpacking of moves
+def move(src, dst, num) : return src | dst << 4 | num << 8
+
+#Turning the face down top card of a column faceup is a move from the column onto itself
+def flip(col) : return col | col << 4
+
+def source(move) : return move & 15
+
+def dest(move) : return move >> 4 & 15
+
+def number(move) : return move >> 8
+
+def isFlip(move) : return move & 15 == move >> 4 & 15
+
+#The move that puts the cards back where they came from (flips are reversed by Klondike.undo)
+def reverse(move) : return (move >> 4 & 15) | (move & 15) << 4 | (move >> 8) << 8
+
+def moveName(move) :
+	if isFlip(move) : return 'Flip ' + PILE_NAMES[source(move)]
+	return PILE_NAMES[source(move)] + ' -> ' + PILE_NAMES[dest(move)] + ' (' + str(number(move)) + ')'
+
+#Can card above be put on card below in a tableau column (only kings go onto an empty column)
+def canStack(below, above) :
+	if below == NONE : return RANK[above] == KING
+	return RANK[below] == RANK[above] + 1 and COLOR[below] != COLOR[above]
+
+#Can card be put on a foundation whose top card is top (only aces go onto an empty foundation)
+#The next card of the same suit is exactly four codes along
+def canFound(top, card) :
+	if top == NONE : return RANK[card] == ACE
+	return top + 4 == card
+
+
+#The rules of where cards may go, compiled into tables when they are made, so checking a move is a single lookup
+#stack(below, card) says if card can go onto below in a tableau column, found(top, card) if it can go onto a foundation whose top card is top
+#(below and top are NONE for an empty pile)
+#A table has a row of 52 bytes per card and a last row for NONE, so table[below][card] works for every below, as NONE (-1) indexes the last row
+class Rules(object) :
+	def __init__(self, name, stack, found) :
+		self.name = name
+		self.stack = compileRule(stack)
+		self.found = compileRule(found)
+		#The cards that can go onto each card (or an empty pile), in a column and on a foundation
+		self.onto = [[card for card in range(52) if row[card]] for row in self.stack]
+		self.founding = [[card for card in range(52) if row[card]] for row in self.found]
+
+	def __repr__(self) : return 'Rules(' + self.name + ')'
+
+def compileRule(rule) :
+	return [bytes(rule(below, card) for card in range(52)) for below in list(range(52)) + [NONE]]
+
+KLONDIKE = Rules('klondike', canStack, canFound)
+
+
+#What a card is, apart from where it is in a game
+#There is exactly one of these per card (see CARDS), shared by every game, so they cannot be changed
+class CardId(object) :
+	__slots__ = ('name', 'code', 'number', 'suit', 'color')
+
+	def __init__(self, code) :
+		object.__setattr__(self, 'name', NAMES[code])
+		object.__setattr__(self, 'code', code)
+		object.__setattr__(self, 'number', RANK[code] + 1) #1 is an ace, 13 a king
+		object.__setattr__(self, 'suit', SUIT[code])
+		object.__setattr__(self, 'color', COLOR[code])
+
+	def __setattr__(self, name, value) :
+		raise AttributeError('CardId is immutable')
+
+	def __hash__(self) : return self.code
+
+	def __repr__(self) : return 'CardId(' + self.name + ')'
+
+	#Unpickled cards are the shared ones, not copies
+	def __reduce__(self) : return (cardId, (self.code, ))
+
+def cardId(code) : return CARDS[code]
+
+CARDS = [CardId(code) for code in range(52)]
+
+
+#The card codes in the order a deal with this seed is made in (Game.loadCards shuffles its cards the same way)
+def shuffled(seed) :
+	codes = list(range(52))
+	random.Random(seed).shuffle(codes)
+	return codes
+
+
+#The state of one game
+#self.piles holds a list of cards per pile number (the last card is on top)
+#self.hidden holds the number of facedown cards at the bottom of each tableau column
+#The stock is always facedown and the waste and foundations are always faceup
+#passes limits how often the stock can be gone through (None for no limit), self.recycles counts the times the waste has been turned over
+class Klondike(object) :
+	def __init__(self, draw = 1, rules = KLONDIKE, passes = None) :
+		self.draw = draw #How many cards are turned from the stock at once
+		self.rules = rules
+		self.passes = passes
+		self.recycles = 0
+		self.piles = [[] for i in range(PILES)]
+		self.hidden = [0] * STOCK
+		self.found = 0 #Cards on the foundations (all 52 is a win)
+
+	#Deal the cards the same way Game.populatePiles does
+	#Column i gets i + 1 cards with only the last one faceup and the remaining cards go to the stock
+	@classmethod
+	def deal(cls, codes, draw = 1) :
+		state = cls(draw)
+		marker = 0
+		for col in range(STOCK) :
+			state.piles[col] = list(codes[marker : marker + col + 1])
+			state.hidden[col] = col
+			marker += col + 1
+		state.piles[STOCK] = list(codes[marker : ])
+		return state
+
+	def copy(self) :
+		state = Klondike(self.draw, self.rules, self.passes)
+		state.recycles = self.recycles
+		state.piles = [list(pile) for pile in self.piles]
+		state.hidden = list(self.hidden)
+		state.found = self.found
+		return state
+
+	def top(self, pile) :
+		cards = self.piles[pile]
+		return cards[-1] if cards else NONE
+
+	def won(self) : return self.found == 52
+
+	#How many cards of each suit are on the foundations
+	def suitCounts(self) :
+		counts = [0] * 4
+		for cards in self.piles[FOUNDATION : ] :
+			if cards : counts[SUIT[cards[-1]]] = RANK[cards[-1]] + 1
+		return counts
+
+	#The piles as bytes, each one after a byte that is not a card code: the tableau columns in the order cols (each starting with its number of facedown cards),
+	#the stock, the waste and the foundations, or with suits only the number of cards of each suit on the foundations (see memo.positionHash)
+	def pack(self, cols = range(STOCK), suits = False) :
+		data = bytearray()
+		for col in cols :
+			data.append(255)
+			data.append(self.hidden[col])
+			data.extend(self.piles[col])
+		for pile in (STOCK, WASTE) :
+			data.append(255)
+			data.extend(self.piles[pile])
+		if suits :
+			data.append(255)
+			data.extend(self.suitCounts())
+		else :
+			for pile in range(FOUNDATION, PILES) :
+				data.append(255)
+				data.extend(self.piles[pile])
+		return data
+
+	#A compact hashable snapshot of the state (equal states give equal keys)
+	#With limited passes, the times the waste was turned over are part of the state
+	def key(self) :
+		data = self.pack()
+		if self.passes is not None : data.append(self.recycles)
+		return bytes(data)
+
+	#Can the waste be turned back over into the stock once the stock is empty
+	def canRecycle(self) : return self.passes is None or self.recycles < self.passes - 1
+
+	#The move made when the stock is clicked (None if the stock is empty and the waste is empty or cannot be turned over)
+	def drawMove(self) :
+		stock = len(self.piles[STOCK])
+		if stock : return move(STOCK, WASTE, min(self.draw, stock))
+		waste = len(self.piles[WASTE])
+		if waste and self.canRecycle() : return move(WASTE, STOCK, waste)
+
+	#Is moving the top num cards of src onto dst allowed by the rules
+	#Drawing from the stock is not checked here, use drawMove
+	def canMove(self, src, dst, num) :
+		if src == dst or src == STOCK or num < 1 : return False
+		cards = self.piles[src]
+		if num > len(cards) : return False
+		if src < STOCK :
+			if len(cards) - num < self.hidden[src] : return False #Facedown cards cannot be moved
+		elif num != 1 : return False
+
+		card = cards[-num]
+		target = self.piles[dst]
+		if dst < STOCK :
+			if not target : return self.rules.stack[NONE][card]
+			if len(target) == self.hidden[dst] : return False #The card must be faceup to be added to
+			return self.rules.stack[target[-1]][card]
+		if dst >= FOUNDATION :
+			return num == 1 and self.rules.found[target[-1] if target else NONE][card]
+		return False
+
+	#All legal moves in this state
+	def moves(self) :
+		piles = self.piles
+		hidden = self.hidden
+		stack = self.rules.stack
+		found = self.rules.found
+		result = []
+
+		tops = [pile[-1] if pile else NONE for pile in piles]
+		#The tableau columns that can be added to (those that are empty or have a faceup top card)
+		open_cols = [col for col in range(STOCK) if len(piles[col]) != hidden[col] or not piles[col]]
+
+		for src in range(PILES) :
+			if src == STOCK : continue
+			cards = piles[src]
+			if not cards : continue
+
+			if src < STOCK :
+				if len(cards) == hidden[src] :
+					result.append(flip(src))
+					continue
+				first = hidden[src]
+			else :
+				first = len(cards) - 1
+
+			#Single top cards can go to the foundations
+			top = tops[src]
+			for dst in range(FOUNDATION, PILES) :
+				if dst != src and found[tops[dst]][top] : result.append(move(src, dst, 1))
+
+			#Any faceup card (and all cards above it) can go onto a tableau column
+			for i in range(first, len(cards)) :
+				card = cards[i]
+				for dst in open_cols :
+					if dst != src and stack[tops[dst]][card] : result.append(move(src, dst, len(cards) - i))
+
+		draw = self.drawMove()
+		if draw is not None : result.append(draw)
+		return result
+
+	#Make a move (no rule checks are done, that is what canMove and moves are for)
+	def apply(self, move) :
+		src = move & 15
+		dst = move >> 4 & 15
+		if src == dst :
+			self.hidden[src] -= 1
+			return
+
+		num = move >> 8
+		piles = self.piles
+		#Most moves are of one card, which needs no slice (and one card reversed is the same card)
+		if num == 1 : piles[dst].append(piles[src].pop())
+		else :
+			cards = piles[src][-num : ]
+			del piles[src][-num : ]
+			#Cards flipped between the stock and waste change order
+			if src == STOCK or dst == STOCK : cards.reverse()
+			piles[dst].extend(cards)
+
+		if dst >= FOUNDATION : self.found += num
+		elif dst == STOCK : self.recycles += 1
+		if src >= FOUNDATION : self.found -= num
+
+	#Take back a move that was the last one applied
+	#This is apply done backwards rather than a call of it, so a WatchedKlondike does not see the move back as a move of its own
+	def undo(self, move) :
+		src = move & 15
+		dst = move >> 4 & 15
+		if src == dst :
+			self.hidden[src] += 1
+			return
+
+		num = move >> 8
+		piles = self.piles
+		if num == 1 : piles[src].append(piles[dst].pop())
+		else :
+			cards = piles[dst][-num : ]
+			del piles[dst][-num : ]
+			if src == STOCK or dst == STOCK : cards.reverse()
+			piles[src].extend(cards)
+
+		if dst >= FOUNDATION : self.found -= num
+		elif dst == STOCK : self.recycles -= 1
+		if src >= FOUNDATION : self.found += num
+
+
+#A Klondike that tells its watchers about every move made on it and taken back, with their add(move) and undo(move)
+#Its copies (like the ones the solver searches with) are plain Klondikes, so the moves made on them are not seen
+class WatchedKlondike(Klondike) :
+	def __init__(self, draw = 1, rules = KLONDIKE, passes = None) :
+		Klondike.__init__(self, draw, rules, passes)
+		self.watchers = []
+
+	def apply(self, move) :
+		Klondike.apply(self, move)
+		for watcher in self.watchers : watcher.add(move)
+
+	def undo(self, move) :
+		Klondike.undo(self, move)
+		for watcher in self.watchers : watcher.undo(move)
@@ -1,9 +1,21 @@
 import pygame
 import sys
+import os
 from objects import *
+import engine
+import abstract
+import inputlog
+import cardsets
+import instrument
+import gamerecord
+import hints
+import journal
+import memo
+import variants
 from general import SolSet
 from pygame.locals import *
 import random
+import time
 
 class DoubleClick :
 	def __init__(self) :
@@ -38,64 +50,258 @@ class DoubleClick :
 		return False
 
 
-class Game :
+#Merge each run of mouse motion events into one, at the last position and with the movements added up
+#Dragged cards are then moved once per run rather than once per event
+#Only motion that follows motion is merged, so clicks keep their place between the movements
+#A merged event keeps the events it was made of (motions), so an input log still records every one of them (see inputlog.py)
+def coalesceMotion(events) :
+	merged = []
+	run = [] #The motion events since the last other event
+	for event in events + [None] :
+		if event is not None and event.type == MOUSEMOTION :
+			run.append(event)
+			continue
+
+		if len(run) == 1 : merged.append(run[0])
+		elif run :
+			rel = (sum(motion.rel[0] for motion in run), sum(motion.rel[1] for motion in run))
+			merged.append(pygame.event.Event(MOUSEMOTION, pos = run[-1].pos, rel = rel, buttons = run[-1].buttons, motions = run))
+		run = []
+		if event is not None : merged.append(event)
+	return merged
+
+
+#Decides how fast the game loop goes round
+#While something moves on screen (cards being dragged or the win animation) frames are capped at SolSet.target_fps
+#Otherwise the 'block' policy sleeps until there is input, and the 'fps' policy keeps going at the target rate
+class Scheduler :
 	def __init__(self) :
+		self.clock = pygame.time.Clock()
+		self.start = 0.0
+		self.frame_time = 0.0 #Processor seconds used by the last frame (waiting and sleeping are not counted)
+		self.average_time = 0.0 #A moving average of frame_time
+		self.frame = instrument.NULL_SPAN
+
+	#The events for this frame
+	def events(self, busy) :
+		events = []
+		if not busy and SolSet.frame_policy == 'block' :
+			with instrument.span('wait', category = 'idle') : events.append(pygame.event.wait())
+		self.frame = instrument.span('frame').begin()
+		with instrument.span('events') : events = coalesceMotion(events + pygame.event.get())
+		instrument.count('events', len(events))
+		self.start = time.process_time()
+		return events
+
+	#Measure the frame that was just drawn and wait for the next one (if it is not waiting for input anyway)
+	def endFrame(self, busy) :
+		self.frame_time = time.process_time() - self.start
+		self.average_time += (self.frame_time - self.average_time) * 0.05
+		self.frame.end()
+		if busy or SolSet.frame_policy == 'fps' : self.clock.tick(SolSet.target_fps)
+
+
+#Posted by a hint search running in a thread whenever its hint changes, so a game waiting for input wakes up to show it
+HINT_EVENT = pygame.USEREVENT + 1
+
+def postHint(search) :
+	try : pygame.event.post(pygame.event.Event(HINT_EVENT))
+	except pygame.error : pass #The game was quit while searching
+
+
+class Game :
+	#The same seed always gives the same deal (see engine.shuffled), no seed gives a random one
+	#With a record path, the input is written to an input log there (see inputlog.py and replay.py)
+	def __init__(self, seed = None, record = None) :
 		pygame.init()
 		random.seed()
+		self.recorder = inputlog.InputRecorder(record) if record else None
+		if SolSet.profile_trace : instrument.start()
 
+		self.cardset = cardsets.current() #The deck played with (None if the images have no config.txt)
+		if self.cardset : self.cardset.select()
+		self.origin = (0, 0) #The top left corner of the table in the window (see fitTable)
 		self.screen = self.setDisplay() #Display dimensions
+		self.window_size = self.screen.get_size() #The size of the window when it is not fullscreen
+		if SolSet.preload_images :
+			abstract.preloadImages(SolSet.image_names + [SolSet.image_back, SolSet.image_bottom])
 		self.double_click = DoubleClick() #Double click checker
+		self.scheduler = Scheduler() #Frame pacing
 		self.move_pile = Repository('Repository') #For moving piles
 
-		self.cards = self.loadCards() #All the cards
+		self.seed = self.nextSeed() if seed is None else seed #The seed of the current deal
+		self.cards = self.loadCards(self.seed) #All the cards
+		self.state = None #The deal in the rules engine (see populatePiles)
+		self.journal = None #The moves made in this deal
+		self.writer = None #The gamerecord.GameWriter of this deal (with SolSet.game_dir)
 		self.piles = self.populatePiles() #All the piles
+		self.move_pile.bind(self.piles)
+		self.grid = self.indexPiles() #Finds piles by position
+
+		self.background = None #The table under the cards (see drawBackground)
+		self.background_piles = [] #The empty piles whose bottoms are in self.background
+		self.memo = memo.Memo(SolSet.memo_path) if SolSet.memo_path else None #What earlier hint searches found out
+		self.hint = None #The hints.HintSearch for the position the game is in (see startHint)
+		self.hint_shown = False #Is the hint outlined on the table, or only searched for to tell when the game is stuck
+		self.hint_rects = [] #Where the hint is outlined
+		abstract.AbstractPile.bottom_layer = SolSet.cached_layers
+
+		abstract.dirty.enabled = SolSet.dirty_rects
+		abstract.dirty.mark(self.screen.get_rect())
 
 	#The display dimensions are calculated given the wanted margins and card dimensions
 	def setDisplay(self) :
+		return pygame.display.set_mode(self.tableSize(), RESIZABLE if SolSet.resizable else 0)
+
+	#The size of the table when drawn at the size of the cardset
+	def tableSize(self) :
 		x_dim = (SolSet.margin_space * 2) + (SolSet.image_resolution[0] * 7) + (SolSet.start_space * 6)
 		y_dim = SolSet.margin_space + (SolSet.image_resolution[1] * 2) + SolSet.row_space
 		y_dim += (SolSet.tile_small_space * 6) + (SolSet.tile_large_space * 12)
-		return pygame.display.set_mode((x_dim, y_dim))
+		return (x_dim, y_dim)
+
+	#Where the piles go at the current scale (see abstract.image_scale)
+	#Returns the position of the start pile, of the seven main piles and of the four suit piles (above the last four main piles)
+	def pilePositions(self) :
+		card_w, card_h = abstract.scaledSize(SolSet.image_resolution)
+		space = abstract.scaled(SolSet.start_space)
+		x = self.origin[0] + abstract.scaled(SolSet.margin_space)
+		top = self.origin[1] + abstract.scaled(SolSet.margin_space)
+		y = top + card_h + abstract.scaled(SolSet.row_space)
+		mains = [(x + i * (card_w + space), y) for i in range(7)]
+		suits = [(pos[0], top) for pos in mains[3 : ]]
+		return (x, top), mains, suits
+
+	#The window changed size
+	def resize(self, size) :
+		self.screen = pygame.display.set_mode(size, RESIZABLE)
+		self.fitTable(self.screen.get_size())
+
+	def toggleFullscreen(self) :
+		if self.screen.get_flags() & FULLSCREEN :
+			self.screen = pygame.display.set_mode(self.window_size, RESIZABLE)
+		else :
+			self.window_size = self.screen.get_size()
+			self.screen = pygame.display.set_mode((0, 0), FULLSCREEN)
+		self.fitTable(self.screen.get_size())
+
+	#Play on with the next of the cardsets in SolSet.cardset_dir
+	def nextCardset(self) :
+		found = cardsets.findCardsets(SolSet.cardset_dir)
+		if not found : return
+		paths = [os.path.abspath(cardset.path) for cardset in found]
+		current = os.path.abspath(SolSet.image_path)
+		index = (paths.index(current) + 1) % len(found) if current in paths else 0
+		self.setCardset(found[index])
+
+	#Swap the deck the game is played with, keeping the game as it is
+	#The images of the old cardset are dropped, and the faces of the new one are only decoded as they are drawn
+	def setCardset(self, cardset) :
+		old = SolSet.image_path
+		cardset.select()
+		self.cardset = cardset
+		if os.path.abspath(old) != os.path.abspath(cardset.path) : abstract.clearImages(old)
+		self.fitTable(self.screen.get_size())
+
+	#Scale the table to fit into a window of this size (in the middle of it), keeping the game as it is
+	#The images come from abstract.scaled_cache, so going back to a size does not scale them again
+	def fitTable(self, size) :
+		if self.recorder : self.recorder.resize(size)
+		if self.move_pile.hasCards() : self.move_pile.returnCards()
+		width, height = self.tableSize()
+		abstract.image_scale = min(size[0] / float(width), size[1] / float(height))
+		self.origin = ((size[0] - abstract.scaled(width)) // 2, (size[1] - abstract.scaled(height)) // 2)
+
+		Card.loadBack(SolSet.image_back)
+		start, mains, suits = self.pilePositions()
+		for pile in self.piles : pile.rescale()
+		for pile, pos in zip(self.piles[ : 7], mains) :
+			pile.setSpacing(abstract.scaled(SolSet.tile_small_space), abstract.scaled(SolSet.tile_large_space))
+			pile.setPosition(pos)
+		for pile, pos in zip(self.piles[-4 : ], suits) : pile.setPosition(pos)
+		start_pile = self.piles[7]
+		start_pile.space = abstract.scaled(SolSet.start_space)
+		start_pile.setPosition(start)
+		start_pile.arrange()
+
+		self.grid = self.indexPiles()
+		self.background = None
+		abstract.dirty.mark(self.screen.get_rect())
+
+	#The seed of a random deal
+	#Every deal has a seed, so a deal can be recorded and made again
+	def nextSeed(self) :
+		return random.getrandbits(32)
 
 	#Load the cards (the common card back and the card images)
-	def loadCards(self) :
+	#The cards are shuffled the same way engine.shuffled shuffles the card codes
+	def loadCards(self, seed = None) :
+		if self.recorder and seed is not None : self.recorder.deal(seed, variants.variant(SolSet.variant))
 		Card.loadBack(SolSet.image_back)
 		cards = [Card(x, (0, 0)) for x in SolSet.image_names]
-		random.shuffle(cards)
+		random.Random(seed).shuffle(cards)
 		return cards
 
-	#Place the piles (are reset the SuitPile win number down to 0)
+	#Place the piles
+	#The same deal is made in the rules engine (self.state), which every pile is linked to, by the variant of SolSet.variant (see variants.py)
+	#The moves made on it are kept in a journal, to take back and make again (see undo and redo)
+	#With SolSet.game_dir they are also written to a game record there (see gamerecord.py), named after the seed and the time of the deal
 	def populatePiles(self) :
+		self.closeGame()
+		variant = variants.variant(SolSet.variant)
+		self.state = variant.deal([card.code for card in self.cards], engine.WatchedKlondike)
+		self.journal = journal.Journal()
+		self.state.watchers.append(self.journal)
+		if SolSet.game_dir :
+			path = os.path.join(SolSet.game_dir, '%d-%d.sgr' % (self.seed, time.time()))
+			self.writer = gamerecord.GameWriter(path, self.seed, self.state, buffered = False, variant = variant)
+			self.state.watchers.append(self.writer)
 		piles = []
 		suit_piles = []
-		SuitPile.total_cards = 0
+
+		start, mains, suits = self.pilePositions()
+		small_space = abstract.scaled(SolSet.tile_small_space)
+		large_space = abstract.scaled(SolSet.tile_large_space)
 
 		marker = 0 #Keeps track of the last card added
-		x = SolSet.margin_space #The x_position of the pile
-		y = SolSet.margin_space + SolSet.image_resolution[1] + SolSet.row_space
 		for i in range(1,8) : #Need seven main piles
 			pile_name = 'Main' + str(i)
-			cards = self.cards[marker : i + marker] #Each pile position also tells me how many cards it needs
-			piles.append(MainPile(pile_name, (x, y), SolSet.image_bottom, SolSet.tile_small_space, SolSet.tile_large_space, cards))
+			cards = self.cards[marker : variant.columns[i - 1] + marker] #The variant tells how many cards each pile needs
+			piles.append(MainPile(pile_name, mains[i - 1], SolSet.image_bottom, small_space, large_space, cards, variant.hidden[i - 1]))
+			piles[-1].bind(self.state, engine.TABLEAU + i - 1)
 
 			#The suit piles are exactly above main piles (starting on the four one)
-			if i > 3 : suit_piles.append(SuitPile('Suit' + str(i - 3), (x, SolSet.margin_space), SolSet.image_bottom))
+			if i > 3 :
+				suit_piles.append(SuitPile('Suit' + str(i - 3), suits[i - 4], SolSet.image_bottom))
+				suit_piles[-1].bind(self.state, engine.FOUNDATION + i - 4)
 
-			#tick along x and marker
-			x += piles[-1].rect.w + SolSet.start_space
-			marker = i + marker
+			#tick along marker
+			marker = len(cards) + marker
 
 		#Add the start pile 
 		cards = self.cards[marker : 52] #The remaining cards
-		piles.append(StartPile('Start', (SolSet.margin_space, SolSet.margin_space), SolSet.start_space, SolSet.image_bottom, cards))
+		piles.append(StartPile('Start', start, abstract.scaled(SolSet.start_space), SolSet.image_bottom, cards))
+		piles[-1].bind(self.state)
 		
 		piles.extend(suit_piles) #The last four piles always must be the suit piles
 		return piles
 
+	#Put the piles in a grid, so clicks and drops are looked up by position
+	#The grid cells are a card and its spacing wide and high, so every pile is in only a few cells
+	#The piles of a StartPile stand in for the StartPile itself
+	def indexPiles(self) :
+		card_w, card_h = abstract.scaledSize(SolSet.image_resolution)
+		cell = (card_w + abstract.scaled(SolSet.start_space), card_h + abstract.scaled(SolSet.row_space))
+		grid = abstract.SpatialIndex(cell)
+		for pile in self.piles :
+			if isinstance(pile, abstract.AbstractMultiPile) :
+				for part in pile.piles : grid.add(part, pile)
+			else : grid.add(pile)
+		return grid
+
 	#simply gets the pile that was clicked (none if no pile was clicked)
 	def clickedPile(self, event) :
-		for pile in self.piles :
-			if pile.hasPosition(event.pos) : return pile
+		return self.grid.find(event.pos)
 
 	#The basic idea of the game loop is thus :
 	#If a pile is clicked, onClick() is run
@@ -108,13 +314,19 @@ class Game :
 			if self.winCondition() : 
 				self.browninanMotion(2) #Move the piles around randomly if game has been won
 
-	 		for event in pygame.event.get() :
-	 			#Check and store if a double click occured
-	 			if (event.type == MOUSEBUTTONUP or event.type == MOUSEBUTTONDOWN) and event.button == 1 :
-					self.double_click.isDC(event)
+			busy = self.winCondition() or self.move_pile.hasCards() or self.hintSlicing()
+			for event in self.scheduler.events(busy) :
+				#Check and store if a double click occured
+				if (event.type == MOUSEBUTTONUP or event.type == MOUSEBUTTONDOWN) and event.button == 1 :
+					with instrument.span('isDC') : self.double_click.isDC(event)
+				if self.recorder : self.recorder.event(event, self.double_click.wasDC)
 
 				#Check if the program is quit
 				if event.type == QUIT :
+					self.cancelHint()
+					self.closeGame()
+					if self.recorder : self.recorder.close()
+					if instrument.profiler : self.saveProfile()
 					pygame.quit()
 					sys.exit()	
 
@@ -122,6 +334,26 @@ class Game :
 				if event.type == KEYUP and event.key == K_r :
 					self.reset()
 
+				#The table is scaled to fit the window
+				if event.type == VIDEORESIZE :
+					self.resize(event.size)
+				if event.type == KEYUP and event.key == K_f and SolSet.resizable :
+					self.toggleFullscreen()
+
+				#Pressing c switches to the next cardset
+				if event.type == KEYUP and event.key == K_c :
+					self.nextCardset()
+
+				#Pressing z takes back the last move and y makes it again
+				if event.type == KEYUP and event.key == K_z :
+					self.undo()
+				if event.type == KEYUP and event.key == K_y :
+					self.redo()
+
+				#Pressing h searches for a hint (without holding up the game)
+				if event.type == KEYUP and event.key == K_h :
+					self.startHint()
+
 				#If the game has been won, reset it with a mouse click
 				if self.winCondition():
 					if event.type == MOUSEBUTTONUP and event.button == 1 :
@@ -136,11 +368,15 @@ class Game :
 
 						if move_pile_full : #If yes
 							#This finds the left most pile where the dropped cards are accepted
+							#Only the piles the cards touch can take them
+							#The rules were checked when the cards were taken, so only the piles the cards touch are left to find
 							selected_pile = None
-							for pile in self.piles :
-								if pile.validAddCards(self.move_pile.cards) : 
-									selected_pile = pile
-									break
+							with instrument.span('drop targets') :
+								touched = self.grid.collide(self.move_pile.cards[0].rect)
+								for pile in self.move_pile.targets :
+									if pile in touched and pile.touchesCards(self.move_pile.cards) : 
+										selected_pile = pile
+										break
 
 							#If a valid pile is found, drop the cards there, otherwise return the cards
 							if selected_pile : self.move_pile.addToPile(selected_pile)
@@ -151,59 +387,193 @@ class Game :
 
 						#If the move_pile was empty and no double click, just run a simple onClick on the pile
 						if not move_pile_full and not self.double_click.wasDC :
-						 	clicked_pile = self.clickedPile(event)
+							clicked_pile = self.clickedPile(event)
 
-						 	if clicked_pile :
-						 		clicked_pile.onClick(event)
+							if clicked_pile :
+								with instrument.span('onClick', clicked_pile.name) : clicked_pile.onClick(event)
 
 					#If mouse is held down, move those cards to the self.move_pile
 					if event.type == MOUSEBUTTONDOWN and event.button == 1 :
 						clicked_pile = self.clickedPile(event)
 
-					 	if clicked_pile :
-					 		cards_taken = clicked_pile.onClick(event)
-				 			if cards_taken : self.move_pile.addCards(cards_taken)
+						if clicked_pile :
+							with instrument.span('onClick', clicked_pile.name) : cards_taken = clicked_pile.onClick(event)
+							if cards_taken : self.move_pile.addCards(cards_taken)
 
-				 	#if the mouse is moved, move the mouse_pile (if it has cards)
-				 	if event.type == MOUSEMOTION :
+					#if the mouse is moved, move the mouse_pile (if it has cards)
+					if event.type == MOUSEMOTION :
 						if self.move_pile.hasCards() : self.move_pile.movePosition(event.rel)
 
-			self.screen.fill((0, 0, 0))
-			self.draw()
-			pygame.display.flip()
+			self.updateHint()
+			self.render()
+			self.scheduler.endFrame(self.winCondition() or self.move_pile.hasCards() or self.hintSlicing())
 
 
 	#When a double click occurs, try to put that card in the suit piles
+	#The card goes through self.move_pile, so the move is made the same way as a drag and drop
 	def onDoubleClick(self, event) :
 		clicked_pile = self.clickedPile(event) #Get the clicked pile
 
 		if clicked_pile :
 			#onDoubleClick always returns only one card
-			card_taken = clicked_pile.onDoubleClick(event)
+			with instrument.span('onDoubleClick', clicked_pile.name) : card_taken = clicked_pile.onDoubleClick(event)
 			if card_taken : #If a card is returned (double click was valid)
+				self.move_pile.addCards(card_taken)
 				no_home = True #This card right now has no home in the Suit piles
 				for pile in self.piles[-4:] : #Go through the four suit piles
-					#The False ensures that the card_taken does not have to contact the Suit piles
-					if pile.validAddCards(card_taken, False) : 
-						pile.addCards(card_taken)
+					#The card does not have to touch the suit pile, the rules are all that matter
+					if pile in self.move_pile.targets : 
+						self.move_pile.addToPile(pile)
 						no_home = False
 						break;
 				#If no suit pile has been found, return the card that was double clicked
-				if no_home : card_taken[0].pile.addCards(card_taken)
+				if no_home : self.move_pile.returnCards()
 
-	#Draw is simple, just draw all the piles
+	#Put the frame on the screen
+	#With SolSet.dirty_rects only the areas that changed are drawn (everything else is clipped away) and updated
+	def render(self) :
+		if not SolSet.dirty_rects :
+			self.draw()
+			with instrument.span('flip') : pygame.display.flip()
+			return
+
+		rects = abstract.dirty.take()
+		for rect in rects :
+			self.screen.set_clip(rect)
+			self.draw()
+		self.screen.set_clip(None)
+		if rects :
+			with instrument.span('flip') : pygame.display.update(rects)
+
+	#Draw is simple, just draw the table and all the piles
 	def draw(self) :
-		for pile in self.piles :
-			pile.draw(self.screen)
+		with instrument.span('draw') :
+			with instrument.span('draw', 'background') : self.drawBackground()
+			for pile in self.piles :
+				with instrument.span('draw', pile.name) : pile.draw(self.screen)
+
+			if self.hint_rects :
+				with instrument.span('draw', 'hint') : self.drawHint()
+			with instrument.span('draw', self.move_pile.name) : self.move_pile.draw(self.screen)
+
+	#The table under the cards
+	#With SolSet.cached_layers the bottoms of the empty piles are drawn onto one surface, which is kept until the piles move or another pile is emptied or filled
+	#(the bottom of a pile with cards is not drawn, as it would show through the corners of the cards)
+	def drawBackground(self) :
+		if not SolSet.cached_layers :
+			self.screen.fill((0, 0, 0))
+			return
 
-		self.move_pile.draw(self.screen)
+		empty = []
+		for pile in self.piles :
+			parts = pile.piles if isinstance(pile, abstract.AbstractMultiPile) else [pile]
+			empty.extend(part for part in parts if part.isEmpty())
+		if self.background is None or empty != self.background_piles :
+			self.background = pygame.Surface(self.screen.get_size()).convert()
+			self.background.fill((0, 0, 0))
+			for pile in empty : pile.drawLayer(self.background)
+			self.background_piles = empty
+		self.screen.blit(self.background, (0, 0))
+
+	#Start looking for a hint from the position the game is in, any older search is given up
+	#With SolSet.hint_mode 'thread' the search runs in a thread of its own, with 'slice' it gets SolSet.hint_budget seconds of every frame (see updateHint)
+	#show is False for the searches of SolSet.auto_hint, which only outline the table once the game is stuck
+	def startHint(self, show = True) :
+		self.cancelHint()
+		threaded = SolSet.hint_mode == 'thread'
+		self.hint = hints.HintSearch(self.state, SolSet.hint_nodes, postHint if threaded else None, self.memo)
+		self.hint_shown = show
+		if threaded and not self.hint.finished() : self.hint.start()
+
+	def cancelHint(self) :
+		if self.hint : self.hint.cancel()
+		self.hint = None
+
+	#Is a hint being searched for a slice at a time (which keeps the game loop from waiting for input)
+	def hintSlicing(self) :
+		return self.hint is not None and SolSet.hint_mode == 'slice' and not self.hint.finished()
+
+	#Called every frame: drop the hint once a move is made, give a slice of the frame to the search, and outline what it found
+	def updateHint(self) :
+		if self.hint and not self.hint.isCurrent(self.state) : self.cancelHint()
+		if self.hint is None and SolSet.auto_hint and not self.winCondition() and not self.move_pile.hasCards() :
+			self.startHint(False)
+		if self.hintSlicing() :
+			with instrument.span('hint') : self.hint.advance(SolSet.hint_budget)
+		rects = self.hintRects()
+		if rects != self.hint_rects :
+			for rect in self.hint_rects + rects : abstract.dirty.mark(rect.inflate(8, 8))
+			self.hint_rects = rects
+
+	#The pile of an engine pile number
+	def pileOf(self, index) :
+		if index < engine.STOCK : return self.piles[index]
+		if index < engine.FOUNDATION : return self.piles[7].piles[index - engine.STOCK]
+		return self.piles[8 + index - engine.FOUNDATION]
+
+	#The areas to outline: the cards to move and where they go, or the whole table when the game is stuck
+	def hintRects(self) :
+		if self.hint is None : return []
+		if self.hint.status == hints.STUCK : return [self.screen.get_rect().inflate(-8, -8)]
+		if not self.hint_shown or self.hint.move is None or self.move_pile.hasCards() : return []
+		move = self.hint.move
+		src = self.pileOf(engine.source(move))
+		if engine.isFlip(move) or engine.source(move) == engine.WASTE and engine.dest(move) == engine.STOCK :
+			return [src.dropRect()] #Flip the card, or click the empty stock to turn the waste over
+		if engine.source(move) == engine.STOCK : return [src.dropRect()] #Click the stock
+		src.place()
+		cards = src.cards[-engine.number(move) : ]
+		return [cards[0].rect.unionall([card.rect for card in cards[1 : ]]), self.pileOf(engine.dest(move)).dropRect()]
+
+	def drawHint(self) :
+		color = SolSet.stuck_color if self.hint.status == hints.STUCK else SolSet.hint_color
+		for rect in self.hint_rects : pygame.draw.rect(self.screen, color, rect.inflate(6, 6), 3)
+
+	#Take back the last move made (not while cards are being dragged, or once the game is won)
+	def undo(self) :
+		move = self.journal.last()
+		if move is None or self.move_pile.hasCards() or self.winCondition() : return
+		self.state.undo(move)
+		self.showMove(move, True)
+
+	#Make the last move taken back again
+	def redo(self) :
+		move = self.journal.next()
+		if move is None or self.move_pile.hasCards() : return
+		self.state.apply(move)
+		self.showMove(move, False)
+
+	#Move the cards on the table the way the rules engine made or took back a move
+	#Cards going into the stock are turned facedown and the ones coming out of it faceup, in the opposite order
+	def showMove(self, move, back) :
+		if engine.isFlip(move) :
+			self.pileOf(engine.source(move)).cards[-1].faceUp = not back
+			return
+		if back : move = engine.reverse(move)
+		src = engine.source(move)
+		dst = engine.dest(move)
+		cards = self.pileOf(src).takeCards(engine.number(move))
+		if src == engine.STOCK or dst == engine.STOCK :
+			cards.reverse()
+			for card in cards : card.faceUp = dst != engine.STOCK
+		self.pileOf(dst).addCards(cards)
+
+	#Finish the record of the game being played
+	def closeGame(self) :
+		if self.writer : self.writer.close()
+		self.writer = None
+
+	#Write the trace of the session (see instrument.py) to SolSet.profile_trace and print where the time went
+	def saveProfile(self) :
+		instrument.saveTrace(SolSet.profile_trace)
+		print(instrument.summary())
 
 	def start(self) :
 		self.gameLoop()
 
 	#When all the cards are in the suit pile
 	def winCondition(self) :
-		return SuitPile.total_cards == len(self.cards)
+		return self.state.won()
 
 	#Moves the piles randomly in all directions (the length arguement specifies how hard they move)
 	def browninanMotion(self, length) :
@@ -211,11 +581,39 @@ class Game :
 			x_move = random.randint(-length, length)
 			y_move = random.randint(-length, length)
 			pile.movePosition((x_move, y_move))
+		self.background = None
 
 	def reset(self) :
-	 	self.cards = self.loadCards()
+		self.cancelHint()
+		self.seed = self.nextSeed()
+		self.cards = self.loadCards(self.seed)
 		self.piles = self.populatePiles()
+		self.move_pile.bind(self.piles)
+		self.grid = self.indexPiles()
+		self.background = None
+		abstract.dirty.mark(self.screen.get_rect())
 
 if __name__ == "__main__": 
-	g = Game()
+	#A seed can be given to play a known deal, --record FILE keeps an input log of the session,
+	#--profile FILE writes a trace of where the time of every frame went and --save DIR keeps a record of every game played
+	#--variant NAME plays another game than Klondike (see variants.py)
+	args = sys.argv[1 : ]
+	record = None
+	if '--record' in args :
+		i = args.index('--record')
+		record = args[i + 1]
+		del args[i : i + 2]
+	if '--profile' in args :
+		i = args.index('--profile')
+		SolSet.profile_trace = args[i + 1]
+		del args[i : i + 2]
+	if '--save' in args :
+		i = args.index('--save')
+		SolSet.game_dir = args[i + 1]
+		del args[i : i + 2]
+	if '--variant' in args :
+		i = args.index('--variant')
+		SolSet.variant = variants.variant(args[i + 1]).name
+		del args[i : i + 2]
+	g = Game(int(args[0]) if args else None, record)
 	g.start()
\ No newline at end of file
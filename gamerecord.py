@@ -0,0 +1,244 @@
+#A compact file of the moves of a game, with the positions along the way kept every so often so any of them can be got to quickly
+#python gamerecord.py game.sgr                 the seed, variant, draw and number of moves
+#python gamerecord.py game.sgr --at 120        and the position after 120 moves
+#Each move is one byte, source | dest << 4: the number of cards moved is worked out from the position it is made in (see unpackMove)
+#That only works when the faceup cards of a column are a run, so in a variant where they need not be (see variants.Variant) a move is
+#two bytes holding the whole engine move instead
+#Taking back a move (see journal.py) is the op of all ones (see undoOp), which undoes the last move that has not been undone yet
+#Layout of a record (little endian):
+#	header: MAGIC, seed (uint32), draw (uint8), variant (uint8, its place in variants.VARIANTS), interval (uint16)
+#	blocks: a checkpoint of the position, followed by the next interval moves
+#A checkpoint is the number of cards in each pile (13 bytes), the facedown cards of each column (7 bytes), the times the waste was turned over (1 byte)
+#and then the card codes of every pile, bottom to top (52 bytes)
+#Every block is the same size, so the block a move is in is found without an index, and only the moves since its checkpoint are made again
+#A game can be added to as it is played, the last block simply being short (a move or checkpoint cut off at the end is left out)
+import argparse
+import mmap
+import os
+import struct
+import sys
+import engine
+import variants
+from engine import STOCK, WASTE, PILES
+
+MAGIC = b'SOLGAME2'
+HEADER = struct.Struct('<8sIBBH')
+CHECKPOINT = PILES + STOCK + 1 + 52
+INTERVAL = 128 #Moves between checkpoints, which costs a little over half a byte per move
+UNDO = 1 << 15 #Set on the moves read from a record that take back the move they hold (engine moves never reach this bit)
+
+#The bytes per move in a record of variant
+def opSize(variant) : return 1 if variant.runs else 2
+
+#The op that takes back a move, all ones in size bytes (not a move, as there is no pile 15)
+def undoOp(size) : return (1 << 8 * size) - 1
+
+def packState(state) :
+	data = bytearray(len(pile) for pile in state.piles)
+	data.extend(state.hidden)
+	data.append(state.recycles)
+	for pile in state.piles : data.extend(pile)
+	return bytes(data)
+
+def unpackState(data, draw, variant) :
+	state = engine.Klondike(draw, variant.rules, variant.passes)
+	marker = CHECKPOINT - 52
+	for pile in range(PILES) :
+		state.piles[pile] = list(data[marker : marker + data[pile]])
+		marker += data[pile]
+	state.hidden = list(data[PILES : PILES + STOCK])
+	state.recycles = data[PILES + STOCK]
+	state.found = sum(data[engine.FOUNDATION : PILES])
+	return state
+
+def packMove(move) :
+	return move & 0xff
+
+#Make a move read from a record, or take it back
+def play(state, move) :
+	if move & UNDO : state.undo(move & ~UNDO)
+	else : state.apply(move)
+
+#The move an opcode stands for in state (the position it is made in)
+#Only one card of a faceup run can go onto a column, so the number of cards moved is known from the source and the dest
+def unpackMove(state, op) :
+	src = op & 15
+	dst = op >> 4
+	if src == dst : return op
+	if src == STOCK : num = min(state.draw, len(state.piles[STOCK]))
+	elif dst == STOCK : num = len(state.piles[WASTE])
+	elif src < STOCK and dst < STOCK :
+		cards = state.piles[src]
+		takes = state.rules.stack[state.top(dst)]
+		num = 0
+		for i in range(state.hidden[src], len(cards)) :
+			if takes[cards[i]] :
+				num = len(cards) - i
+				break
+		if not num : raise ValueError('%s cannot be made' % engine.moveName(engine.move(src, dst, 1)))
+	else : num = 1
+	return engine.move(src, dst, num)
+
+
+#Writes the moves of a game to a record as they are made
+#state is the position the game starts from, the record keeps its own copy to take the checkpoints from
+#variant is the variants.Variant the game is played by (Klondike when None, with the draw of state)
+#It can watch an engine.WatchedKlondike, to write the moves made on it and taken back
+#With buffered False every move goes straight to the file, so a game that is cut off is only missing what was never played
+class GameWriter(object) :
+	def __init__(self, path, seed, state, interval = INTERVAL, buffered = True, variant = None) :
+		if variant is None : variant = variants.VARIANTS[0]
+		self.output = open(path, 'wb', -1 if buffered else 0)
+		self.output.write(HEADER.pack(MAGIC, seed, state.draw, variants.VARIANTS.index(variant), interval))
+		self.state = state.copy()
+		self.interval = interval
+		self.size = opSize(variant)
+		self.count = 0
+		self.output.write(packState(self.state))
+
+	#Carry on writing a record that was cut off, or a game that is still going
+	@classmethod
+	def resume(cls, path, buffered = True) :
+		record = GameRecord(path)
+		writer = cls.__new__(cls)
+		writer.state = record.position(len(record))
+		writer.interval = record.interval
+		writer.size = record.size
+		writer.count = len(record)
+		block = writer.count // writer.interval
+		missing = block == record.checkpoints #The checkpoint of the block the next move goes into was cut off
+		end = HEADER.size + block * record.block if missing else record.offset(writer.count)
+		record.close()
+		writer.output = open(path, 'r+b', -1 if buffered else 0)
+		writer.output.truncate(end)
+		writer.output.seek(end)
+		if missing : writer.output.write(packState(writer.state))
+		return writer
+
+	def add(self, move) :
+		self.state.apply(move)
+		self.write(packMove(move) if self.size == 1 else move)
+
+	def undo(self, move) :
+		self.state.undo(move)
+		self.write(undoOp(self.size))
+
+	def write(self, op) :
+		self.output.write(op.to_bytes(self.size, 'little'))
+		self.count += 1
+		if self.count % self.interval == 0 : self.output.write(packState(self.state))
+
+	def close(self) :
+		self.output.close()
+
+
+#A record mapped into memory
+class GameRecord(object) :
+	def __init__(self, path) :
+		self.path = path
+		with open(path, 'rb') as record : self.map = mmap.mmap(record.fileno(), 0, access = mmap.ACCESS_READ)
+		if len(self.map) < HEADER.size + CHECKPOINT :
+			self.close()
+			raise ValueError(path + ' is not a game record')
+		magic, self.seed, self.draw, variant, self.interval = HEADER.unpack_from(self.map, 0)
+		if magic != MAGIC or not self.interval or variant >= len(variants.VARIANTS) :
+			self.close()
+			raise ValueError(path + ' is not a game record')
+		self.variant = variants.VARIANTS[variant]
+		self.size = opSize(self.variant)
+		self.undo_op = undoOp(self.size)
+		self.block = CHECKPOINT + self.interval * self.size
+		blocks, rest = divmod(len(self.map) - HEADER.size, self.block)
+		self.count = blocks * self.interval + max(0, rest - CHECKPOINT) // self.size
+		self.checkpoints = blocks + (rest >= CHECKPOINT) #The checkpoint after the last full block may not have been written yet
+
+	def __len__(self) : return self.count
+
+	def close(self) :
+		self.map.close()
+
+	#Where in the file the opcode of move number num is
+	def offset(self, num) :
+		block, index = divmod(num, self.interval)
+		return HEADER.size + block * self.block + CHECKPOINT + index * self.size
+
+	#The opcode of move number num
+	def op(self, num) :
+		offset = self.offset(num)
+		if self.size == 1 : return self.map[offset]
+		return int.from_bytes(self.map[offset : offset + self.size], 'little')
+
+	#The move an opcode that is not an undo stands for, in state (the position it is made in)
+	def unpack(self, state, op) :
+		return unpackMove(state, op) if self.size == 1 else op
+
+	#The position at the start of a block
+	def checkpoint(self, block) :
+		start = HEADER.size + block * self.block
+		return unpackState(self.map[start : start + CHECKPOINT], self.draw, self.variant)
+
+	#The position after num moves (a new engine.Klondike)
+	def position(self, num) :
+		if not 0 <= num <= self.count : raise IndexError('the record has %d moves' % self.count)
+		block = min(num // self.interval, self.checkpoints - 1)
+		state = self.checkpoint(block)
+		for i, move in self.replay(state, block * self.interval, num) : pass
+		return state
+
+	#Make moves first up to end on state (the position before move first), giving each move before it is made
+	#An undo takes back the last move made since first, only a move from before that has to be looked for (see undone)
+	def replay(self, state, first, end) :
+		made = []
+		for num in range(first, end) :
+			op = self.op(num)
+			if op != self.undo_op :
+				move = self.unpack(state, op)
+				made.append(move)
+			elif made : move = UNDO | made.pop()
+			else :
+				taken = self.undone(num)
+				move = UNDO | self.unpack(self.position(taken), self.op(taken))
+			yield num, move
+			play(state, move)
+
+	#The number of the move that move num takes back
+	#Going back from it, every undo passed over takes back one more move
+	def undone(self, num) :
+		depth = 0
+		for i in range(num - 1, -1, -1) :
+			if self.op(i) == self.undo_op : depth += 1
+			elif depth : depth -= 1
+			else : return i
+		raise ValueError('move %d takes back a move that was never made' % num)
+
+	#The positions from start on, as (moves made, position, the move made next or None at the end)
+	#The moves that take one back have UNDO set (see play)
+	#This is one engine.Klondike that each move is made on, copy it to keep a position
+	def positions(self, start = 0) :
+		state = self.position(start)
+		for num, move in self.replay(state, start, self.count) : yield num, state, move
+		yield self.count, state, None
+
+	#The engine moves of the game from start on
+	def moves(self, start = 0) :
+		for num, state, move in self.positions(start) :
+			if move is not None : yield move
+
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'Show a game record')
+	parser.add_argument('record')
+	parser.add_argument('--at', type = int, metavar = 'MOVE', help = 'show the position after this many moves')
+	return parser.parse_args(argv)
+
+if __name__ == "__main__":
+	args = parseArgs(sys.argv[1 : ])
+	record = GameRecord(args.record)
+	print('seed %d, %s, draw %d, %d moves, %d bytes' % (record.seed, record.variant.name, record.draw, len(record), os.path.getsize(args.record)))
+	if args.at is not None :
+		state = record.position(args.at)
+		for pile in range(PILES) :
+			cards = [engine.NAMES[card] for card in state.piles[pile]]
+			if pile < STOCK : cards[ : state.hidden[pile]] = ['##'] * state.hidden[pile]
+			print('%-8s %s' % (engine.PILE_NAMES[pile], ' '.join(cards)))
+	record.close()
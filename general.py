@@ -16,6 +16,30 @@ class SolSet :
 	image_back = 'back01'
 	image_bottom = 'bottom02-n'
 	image_resolution = (80, 122)
+	frame_policy = 'block' #When nothing moves, 'block' waits for input and 'fps' keeps drawing at target_fps
+	target_fps = 60
+	dirty_rects = False #Only draw the areas of the screen that changed, rather than the whole screen every frame
+	highlight_targets = False #Outline the piles the cards being dragged can be dropped on
+	highlight_color = (255, 215, 0)
+	cached_layers = True #Draw each tiled pile and the empty table from surfaces that are only drawn again when they change
+	preload_images = False #Decode all the card faces when the game starts rather than when each one is first drawn
+	cardset_dir = '.' #Where the cardsets are looked for (c switches to the next one, see cardsets.py)
+	table_path = 'cards' #Where the images a cardset does not have (like the pile bottoms) are taken from
+	table_type = '.gif'
+	image_bundle = True #Take the images from the cardset bundle when there is one (see bundle.py)
+	resizable = True #The table is scaled to fit the window, which can be resized (and made fullscreen with f)
+	scale_cache_bytes = 64 * 1024 * 1024 #Pixels of scaled images kept in memory (the least recently used are dropped)
+	scale_cache_dir = None #A directory to keep scaled images in between runs, None to only keep them in memory
+	hint_mode = 'thread' #Search for hints (h) in a thread, or 'slice' to search a little every frame where threads cannot be used
+	hint_budget = 0.004 #Seconds of each frame a 'slice' hint search gets
+	hint_nodes = 200000 #Positions a hint search looks at before settling for the best move it found
+	auto_hint = False #Keep searching in the background, so the table is outlined in stuck_color as soon as there is no win
+	memo_path = None #A file to keep what hint searches find out about positions in between games and sessions (see memo.py)
+	hint_color = (0, 200, 255)
+	stuck_color = (220, 0, 0)
+	variant = 'klondike' #The game dealt, one of variants.NAMES (draw3, vegas, yukon, ...)
+	game_dir = None #A directory to write a record of every game played to (see gamerecord.py), None to not keep them
+	profile_trace = None #Path of the trace file to write when the game is quit (see instrument.py), None to not profile
 	start_space = 10
 	row_space = 30
 	margin_space = 20
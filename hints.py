@@ -0,0 +1,96 @@
+#Looks for a good next move while the game goes on, by running the solver (see solver.py) on a copy of the game
+#The search is either run in a thread (start) or a slice at a time from the game loop (advance), so drawing is never held up
+#While it runs, the best move found so far is offered: the first move towards the position with the most cards on the foundations
+#Once the search is done, the hint is the first move of a win, or the game is stuck if the search proved there is no win from here
+#With a memo.Memo, positions searched before (in this game or any other) are answered straight away, and a search that gives up keeps its best move there
+import threading
+import time
+from memo import BEST
+import solver
+
+#How far the search got
+SEARCHING = 'searching'
+DONE = 'done' #The hint is the first move of a win
+STUCK = 'stuck' #There is no win from this position
+GAVE_UP = 'gave up' #The search ran out of nodes or could not rule a win out (see solver.EXHAUSTED), the hint is the best move found
+
+class HintSearch(object) :
+	#Nodes searched between looks at the clock, chances to be cancelled and (in a thread) handing the interpreter back to the game loop
+	#A node takes tens of microseconds, so a slice is well under a millisecond and a frame does not go far over SolSet.hint_budget
+	SLICE = 16
+
+	#state is the engine.Klondike of the game, which is copied (the game can go on while this searches)
+	#notify is called (from the searching thread when there is one) whenever the hint changes
+	def __init__(self, state, max_nodes, notify = None, memo = None) :
+		self.key = state.key() #The position searched from, the search is no use once the game is elsewhere
+		self.memo = memo
+		self.solver = solver.Solver(state, max_nodes, memo = memo)
+		self.notify = notify
+		self.status = SEARCHING
+		self.move = None #The hint (an engine move), None if there is none yet
+		self.best = -1 #Cards on the foundations at the best position seen
+		self.cancelled = threading.Event()
+		self.thread = None
+		if self.solver.result : self.finish(self.solver.result)
+		elif memo :
+			known = memo.lookup(state)
+			if known and known.kind == BEST : self.move = known.move
+
+	def finished(self) : return self.status != SEARCHING
+
+	#Is the hint still about the position the game is in
+	def isCurrent(self, state) : return state.key() == self.key
+
+	#Search in a thread of its own until done or cancelled
+	def start(self) :
+		self.thread = threading.Thread(target = self.run, name = 'hints')
+		self.thread.daemon = True
+		self.thread.start()
+
+	def run(self) :
+		while not self.finished() and not self.cancelled.is_set() :
+			self.step()
+			time.sleep(0) #Let the game loop have the interpreter, it would otherwise wait for a thread switch (every 5 ms)
+
+	#Search for at most about seconds (for games that do not use a thread)
+	#A slice is only started if it is likely to be done in time, going by how long the last one took
+	def advance(self, seconds) :
+		now = time.perf_counter()
+		end = now + seconds
+		took = 0.0
+		while not self.finished() and not self.cancelled.is_set() and now + took < end :
+			self.step()
+			last, now = now, time.perf_counter()
+			took = now - last
+
+	def cancel(self) :
+		self.cancelled.set()
+
+	def step(self) :
+		result = self.solver.step(HintSearch.SLICE)
+		if result : self.finish(result)
+		else : self.improve()
+
+	#Keep the first move of the path to the deepest position seen so far
+	def improve(self) :
+		found = self.solver.state.found
+		if found <= self.best : return
+		path = []
+		for frame in self.solver.stack :
+			path.extend(frame.moves)
+			if path : break
+		if not path : return
+		self.best = found
+		self.offer(path[0], SEARCHING)
+
+	def finish(self, result) :
+		if result.verdict == solver.WINNABLE : self.offer(result.moves[0] if result.moves else None, DONE)
+		elif result.verdict == solver.UNWINNABLE : self.offer(None, STUCK)
+		else :
+			if self.memo and self.move is not None : self.memo.record(self.solver.root, BEST, self.move)
+			self.offer(self.move, GAVE_UP)
+
+	def offer(self, move, status) :
+		self.move = move
+		self.status = status
+		if self.notify : self.notify(self)
@@ -0,0 +1,125 @@
+#A compact binary log of the input a Game got, so a session can be played again (see replay.py)
+#The log starts with MAGIC and is then a list of records, each one a header followed by the data of its kind:
+#	header: milliseconds since the log was started (uint32), kind (uint8), flags (uint8)
+#	DOWN and UP: x, y (int16 each); the flags hold the mouse button and DOUBLE if DoubleClick.isDC saw a double click
+#	MOTION: x, y, x_rel, y_rel (int16 each), one record for each motion event pygame gave, before game.coalesceMotion merged them
+#	RESET: no data (the r key)
+#	DEAL: the seed of the deal (uint32) and the variant it was dealt by (uint8, its place in variants.VARIANTS), written whenever the cards are dealt
+#	RESIZE: width, height (uint16 each) of the window the table was fitted into
+#	UNDO and REDO: no data (the z and y keys)
+#	CARDSET: no data (the c key, which switches to the next cardset in SolSet.cardset_dir, so a replay needs the same cardsets)
+#All numbers are little endian
+import struct
+import time
+import pygame
+from pygame.locals import *
+import variants
+
+MAGIC = b'SOLIN\x02'
+
+DOWN = 0
+UP = 1
+MOTION = 2
+RESET = 3
+DEAL = 4
+RESIZE = 5
+UNDO = 6
+REDO = 7
+CARDSET = 8
+
+KIND_NAMES = ['down', 'up', 'motion', 'reset', 'deal', 'resize', 'undo', 'redo', 'cardset']
+KEYS = {RESET : K_r, UNDO : K_z, REDO : K_y, CARDSET : K_c} #The keys recorded, as the kind of record each one is
+
+DOUBLE = 0x80 #Flag of an up click that ended a double click
+BUTTON = 0x7f #The rest of the flags are the button
+
+HEADER = struct.Struct('<IBB')
+DATA = {
+	DOWN : struct.Struct('<hh'),
+	UP : struct.Struct('<hh'),
+	MOTION : struct.Struct('<hhhh'),
+	RESET : struct.Struct(''),
+	DEAL : struct.Struct('<IB'),
+	RESIZE : struct.Struct('<HH'),
+	UNDO : struct.Struct(''),
+	REDO : struct.Struct(''),
+	CARDSET : struct.Struct(''),
+}
+
+#One record of the log
+#data is the tuple of values that follow the header (see above)
+class Record(object) :
+	__slots__ = ('time', 'kind', 'flags', 'data')
+
+	def __init__(self, time, kind, flags, data) :
+		self.time = time
+		self.kind = kind
+		self.flags = flags
+		self.data = data
+
+	def isDouble(self) : return bool(self.flags & DOUBLE)
+
+	#The pygame event that was recorded (None for DEAL records)
+	def event(self) :
+		if self.kind == DOWN or self.kind == UP :
+			kind = MOUSEBUTTONDOWN if self.kind == DOWN else MOUSEBUTTONUP
+			return pygame.event.Event(kind, pos = self.data, button = self.flags & BUTTON)
+		if self.kind == MOTION :
+			return pygame.event.Event(MOUSEMOTION, pos = self.data[ : 2], rel = self.data[2 : ], buttons = (1, 0, 0))
+		if self.kind in KEYS :
+			return pygame.event.Event(KEYUP, key = KEYS[self.kind])
+		if self.kind == RESIZE :
+			return pygame.event.Event(VIDEORESIZE, size = self.data, w = self.data[0], h = self.data[1])
+		return None
+
+
+#Writes the events a Game gets to a log file
+class InputRecorder(object) :
+	def __init__(self, path) :
+		self.output = open(path, 'wb')
+		self.output.write(MAGIC)
+		self.start = time.perf_counter()
+
+	def write(self, kind, flags, *data) :
+		millis = int((time.perf_counter() - self.start) * 1000) & 0xffffffff
+		self.output.write(HEADER.pack(millis, kind, flags) + DATA[kind].pack(*data))
+
+	#Record a pygame event, double is what DoubleClick.isDC made of it
+	#Only the events the game reacts to are kept
+	def event(self, event, double) :
+		if event.type == MOUSEBUTTONDOWN or event.type == MOUSEBUTTONUP :
+			kind = DOWN if event.type == MOUSEBUTTONDOWN else UP
+			flags = event.button & BUTTON
+			if double and kind == UP : flags |= DOUBLE
+			self.write(kind, flags, event.pos[0], event.pos[1])
+		elif event.type == MOUSEMOTION :
+			for motion in getattr(event, 'motions', [event]) :
+				self.write(MOTION, 0, motion.pos[0], motion.pos[1], motion.rel[0], motion.rel[1])
+		elif event.type == KEYUP :
+			for kind, key in KEYS.items() :
+				if event.key == key : self.write(kind, 0)
+
+	#variant is the variants.Variant the cards are dealt by
+	def deal(self, seed, variant) :
+		self.write(DEAL, 0, seed, variants.VARIANTS.index(variant))
+
+	def resize(self, size) :
+		self.write(RESIZE, 0, size[0], size[1])
+
+	def close(self) :
+		self.output.close()
+
+
+#The records of a log, one at a time
+#A record cut off at the end (by a game that was killed) is left out
+def readLog(path) :
+	with open(path, 'rb') as log :
+		if log.read(len(MAGIC)) != MAGIC : raise ValueError(path + ' is not an input log')
+		while True :
+			header = log.read(HEADER.size)
+			if len(header) < HEADER.size : return
+			millis, kind, flags = HEADER.unpack(header)
+			if kind not in DATA : raise ValueError('Unknown record kind ' + str(kind))
+			data = log.read(DATA[kind].size)
+			if len(data) < DATA[kind].size : return
+			yield Record(millis, kind, flags, DATA[kind].unpack(data))
@@ -0,0 +1,127 @@
+#Opt-in timing of the parts of a frame, written out as a trace that chrome://tracing and ui.perfetto.dev can open
+#Nothing is timed until start() is called, until then span() hands out a shared span that does nothing
+#	with instrument.span('draw') : ...
+#	with instrument.span('onClick', pile.name) : ...      (the detail is only joined to the name while profiling)
+#Every span is kept as a trace event (up to max_events, the oldest are dropped) and counted in the stats of its name
+import collections
+import json
+import time
+
+BUCKETS = 32 #Histogram buckets, bucket i holds durations of less than 2 ** i microseconds
+
+#How often a span ran and how long it took
+class Stats(object) :
+	__slots__ = ('count', 'total', 'longest', 'buckets')
+
+	def __init__(self) :
+		self.count = 0
+		self.total = 0.0
+		self.longest = 0.0
+		self.buckets = [0] * BUCKETS
+
+	def add(self, seconds) :
+		self.count += 1
+		self.total += seconds
+		if seconds > self.longest : self.longest = seconds
+		self.buckets[min(BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+
+	#The upper bound (in seconds) of the bucket the given fraction of the spans falls in
+	def percentile(self, fraction) :
+		needed = self.count * fraction
+		seen = 0
+		for i, num in enumerate(self.buckets) :
+			seen += num
+			if seen >= needed and num : return (1 << i) / 1e6
+		return self.longest
+
+
+#Collects the spans and counters while profiling is on
+class Profiler(object) :
+	def __init__(self, max_events) :
+		self.origin = time.perf_counter()
+		self.events = collections.deque(maxlen = max_events)
+		self.stats = {}
+
+	def add(self, name, category, start, end) :
+		self.events.append((name, category, start, end - start))
+		stats = self.stats.get(name)
+		if stats is None : stats = self.stats[name] = Stats()
+		stats.add(end - start)
+
+	def count(self, name, value) :
+		self.events.append((name, None, time.perf_counter(), value))
+
+	#The trace in the Chrome trace event format (times are in microseconds)
+	def trace(self) :
+		events = []
+		for name, category, start, value in self.events :
+			ts = (start - self.origin) * 1e6
+			if category is None : events.append({'name' : name, 'ph' : 'C', 'ts' : ts, 'pid' : 1, 'tid' : 1, 'args' : {'value' : value}})
+			else : events.append({'name' : name, 'cat' : category, 'ph' : 'X', 'ts' : ts, 'dur' : value * 1e6, 'pid' : 1, 'tid' : 1})
+		return {'traceEvents' : events, 'displayTimeUnit' : 'ms'}
+
+
+#A timed part of a frame, added to the profiler when it ends
+class Span(object) :
+	__slots__ = ('name', 'category', 'start')
+
+	def __init__(self, name, category) :
+		self.name = name
+		self.category = category
+
+	#Spans that do not fit into a with block (like a whole frame) can be started and ended by hand
+	def begin(self) :
+		self.start = time.perf_counter()
+		return self
+
+	def end(self) :
+		if profiler : profiler.add(self.name, self.category, self.start, time.perf_counter())
+
+	def __enter__(self) : return self.begin()
+
+	def __exit__(self, *exc) :
+		self.end()
+		return False
+
+#The span handed out while not profiling
+class NullSpan(object) :
+	def begin(self) : return self
+
+	def end(self) : pass
+
+	def __enter__(self) : return self
+
+	def __exit__(self, *exc) : return False
+
+NULL_SPAN = NullSpan()
+
+profiler = None #The Profiler while profiling is on
+
+def start(max_events = 1000000) :
+	global profiler
+	profiler = Profiler(max_events)
+
+def stop() :
+	global profiler
+	profiler = None
+
+#A span to time a part of the frame with
+def span(name, detail = None, category = 'game') :
+	if profiler is None : return NULL_SPAN
+	if detail is not None : name = name + ' ' + detail
+	return Span(name, category)
+
+#Record the value of a counter (drawn as a graph under the spans)
+def count(name, value) :
+	if profiler : profiler.count(name, value)
+
+def saveTrace(path) :
+	with open(path, 'w') as output : json.dump(profiler.trace(), output)
+
+#A table of the stats of every span, the ones that took the most time in total first
+def summary() :
+	lines = ['%-28s %8s %10s %10s %10s %10s' % ('span', 'count', 'total ms', 'mean us', 'p99 us <', 'max us')]
+	for name, stats in sorted(profiler.stats.items(), key = lambda item : -item[1].total) :
+		lines.append('%-28s %8d %10.1f %10.1f %10.0f %10.1f' % (name, stats.count, stats.total * 1e3,
+			stats.total / stats.count * 1e6, stats.percentile(0.99) * 1e6, stats.longest * 1e6))
+	return '\n'.join(lines)
@@ -0,0 +1,35 @@
+#The moves of a game, so they can be taken back and made again
+#Every change the player makes to the table is one engine move (see engine.py): a drag and drop or double click, a draw or recycle of the stock, or a card turned up
+#Those are two bytes each, so even a very long game takes little memory, and undo and redo are a move each whatever the size of the table
+#The journal watches an engine.WatchedKlondike, so it sees the moves however they are made
+import array
+
+class Journal(object) :
+	def __init__(self) :
+		self.moves = array.array('H') #Every move made, including the ones that have been taken back and can be made again
+		self.length = 0 #How many of self.moves are in effect
+
+	def canUndo(self) : return self.length > 0
+
+	def canRedo(self) : return self.length < len(self.moves)
+
+	#The move to take back (with state.undo), None if there is none
+	def last(self) :
+		return self.moves[self.length - 1] if self.length else None
+
+	#The move to make again (with state.apply), None if there is none
+	def next(self) :
+		return self.moves[self.length] if self.length < len(self.moves) else None
+
+	#A move was made: making the move that was taken back last keeps the rest to redo, any other move forgets them
+	def add(self, move) :
+		if self.length < len(self.moves) and self.moves[self.length] == move :
+			self.length += 1
+			return
+		del self.moves[self.length : ]
+		self.moves.append(move)
+		self.length += 1
+
+	#The last move was taken back
+	def undo(self, move) :
+		self.length -= 1
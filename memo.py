@@ -0,0 +1,213 @@
+#A store on disk of what is known about Klondike positions, so a position searched once never has to be searched again
+#python memo.py positions.memo                  how full the store is and what it holds
+#Positions are looked up by a hash of their canonical form, in which the order of the tableau columns and of the foundations does not matter:
+#the columns are sorted and the foundations are kept as the number of cards of each suit
+#An entry says the position is won in a number of moves (with the next move of the win), dead (the solver found no win) or only the best move found
+#Moves are kept in canonical pile numbers and turned back into the pile numbers of the position they are looked up for
+#Layout of a store (little endian):
+#	header: MAGIC, number of slots (uint32), the clock of the last write (uint32)
+#	slots: hash (uint64, 0 for an empty slot), checksum (uint32), clock when written (uint32), move (uint16), moves to the win (uint16), kind (uint8)
+#A position can be in any of the BUCKET slots from hash % slots, when they are all taken the slot written longest ago is given up
+#The file is mapped into memory: any number of processes can read it while one at a time writes (writes take an flock of the file)
+#A slot read while it is being written fails its checksum and is taken as not being there
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+import engine
+from engine import SUIT, STOCK, FOUNDATION, PILES
+
+try : import fcntl
+except ImportError : fcntl = None #Only one process may write to a store where there is no flock
+
+MAGIC = b'SOLMEMO1'
+HEADER = struct.Struct('<8sII')
+SLOT = struct.Struct('<QIIHHB3x')
+CHECKED = struct.Struct('<QIHHB') #The fields of a slot the checksum is taken over
+BUCKET = 8
+NO_MOVE = 0xffff
+
+#Kinds of entry
+WON = 1 #Won in length moves, move is the first of them
+DEAD = 2 #There is no win (only a search that left no move out says so, see solver.EXHAUSTED)
+BEST = 3 #Not known if it can be won, move is the best one a search found
+
+KIND_NAMES = {WON : 'won', DEAD : 'dead', BEST : 'best'}
+
+#The columns of state in canonical order: cols[i] is the column of state that is column i of the canonical form
+def columnOrder(state) :
+	return sorted(range(STOCK), key = lambda col : (state.hidden[col], state.piles[col]))
+
+#The canonical hash of a position (never 0, which marks an empty slot)
+#With limited passes through the stock, the passes left are part of the position
+def positionHash(state, cols) :
+	data = bytearray([state.draw])
+	if state.passes is not None : data.append(state.passes - state.recycles)
+	data.extend(state.pack(cols, suits = True))
+	return int.from_bytes(hashlib.blake2b(bytes(data), digest_size = 8).digest(), 'little') or 1
+
+#The foundation holding a suit, or the first empty one if the suit has not been started
+def suitPile(state, suit) :
+	empty = None
+	for pile in range(FOUNDATION, PILES) :
+		cards = state.piles[pile]
+		if not cards :
+			if empty is None : empty = pile
+		elif SUIT[cards[0]] == suit : return pile
+	return empty
+
+#Move a move of state into canonical pile numbers (the foundation of a suit is FOUNDATION + the suit)
+def canonicalMove(state, cols, move) :
+	src, dst, num = engine.source(move), engine.dest(move), engine.number(move)
+	if src >= FOUNDATION or dst >= FOUNDATION : suit = SUIT[state.piles[src][-1]]
+	def pile(index) :
+		if index < STOCK : return cols.index(index)
+		if index >= FOUNDATION : return FOUNDATION + suit
+		return index
+	return engine.move(pile(src), pile(dst), num)
+
+#The move of state that a canonical move stands for
+def stateMove(state, cols, move) :
+	def pile(index) :
+		if index < STOCK : return cols[index]
+		if index >= FOUNDATION : return suitPile(state, index - FOUNDATION)
+		return index
+	return engine.move(pile(engine.source(move)), pile(engine.dest(move)), engine.number(move))
+
+
+#What is known about a position, with the move in the pile numbers of the position it was looked up for (None if there is none)
+class Entry(object) :
+	__slots__ = ('kind', 'move', 'length')
+
+	def __init__(self, kind, move, length) :
+		self.kind = kind
+		self.move = move
+		self.length = length
+
+	def __repr__(self) :
+		return 'Entry(%s, %s, %d)' % (KIND_NAMES[self.kind], engine.moveName(self.move) if self.move is not None else None, self.length)
+
+
+#A store mapped into memory, made with slots slots if the file does not exist yet
+#A read only store can be opened by processes that should never write to it
+class Memo(object) :
+	def __init__(self, path, slots = 1 << 20, read_only = False) :
+		self.path = path
+		self.read_only = read_only
+		self.lock = threading.Lock() #Threads of one process take turns at writing, the flock only keeps other processes out
+		if not read_only and not os.path.exists(path) : self.create(path, slots)
+		self.file = open(path, 'rb' if read_only else 'r+b')
+		self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ if read_only else mmap.ACCESS_WRITE)
+		magic, self.slots, clock = HEADER.unpack_from(self.map, 0)
+		if magic != MAGIC or len(self.map) < HEADER.size + self.slots * SLOT.size :
+			self.close()
+			raise ValueError(path + ' is not a position memo')
+
+	#The file is made sparse, so only the pages that get written take up disk space
+	@staticmethod
+	def create(path, slots) :
+		with open(path, 'wb') as output :
+			output.write(HEADER.pack(MAGIC, slots, 0))
+			output.truncate(HEADER.size + slots * SLOT.size)
+
+	def close(self) :
+		self.map.close()
+		self.file.close()
+
+	#The slot at index as (hash, clock, move, length, kind), or None if it is empty or half written
+	def readSlot(self, index) :
+		key, check, clock, move, length, kind = SLOT.unpack_from(self.map, HEADER.size + index * SLOT.size)
+		if key == 0 or check != zlib.crc32(CHECKED.pack(key, clock, move, length, kind)) : return None
+		return key, clock, move, length, kind
+
+	def bucket(self, key) :
+		first = key % self.slots
+		return [(first + i) % self.slots for i in range(BUCKET)]
+
+	def get(self, key) :
+		for index in self.bucket(key) :
+			slot = self.readSlot(index)
+			if slot and slot[0] == key : return slot
+		return None
+
+	#Write an entry for the hash key, over the entry it already has or else the oldest one in its bucket
+	def put(self, key, kind, move, length) :
+		with self.lock :
+			if fcntl : fcntl.flock(self.file, fcntl.LOCK_EX)
+			try :
+				clock = HEADER.unpack_from(self.map, 0)[2] + 1 & 0xffffffff
+				HEADER.pack_into(self.map, 0, MAGIC, self.slots, clock)
+				chosen = None
+				oldest = None
+				for index in self.bucket(key) :
+					slot = self.readSlot(index)
+					if slot is None or slot[0] == key :
+						chosen = index
+						break
+					age = clock - slot[1] & 0xffffffff
+					if oldest is None or age > oldest :
+						chosen = index
+						oldest = age
+				SLOT.pack_into(self.map, HEADER.size + chosen * SLOT.size, key, zlib.crc32(CHECKED.pack(key, clock, move, length, kind)), clock, move, length, kind)
+			finally :
+				if fcntl : fcntl.flock(self.file, fcntl.LOCK_UN)
+
+	#What is known about the position state is in, or None
+	def lookup(self, state) :
+		cols = columnOrder(state)
+		slot = self.get(positionHash(state, cols))
+		if slot is None : return None
+		key, clock, move, length, kind = slot
+		return Entry(kind, None if move == NO_MOVE else stateMove(state, cols, move), length)
+
+	#Keep what is known about the position state is in
+	#A best move never takes the place of a win or a dead end
+	def record(self, state, kind, move = None, length = 0) :
+		if self.read_only : return
+		cols = columnOrder(state)
+		key = positionHash(state, cols)
+		if kind == BEST :
+			slot = self.get(key)
+			if slot and slot[4] != BEST : return
+		self.put(key, kind, NO_MOVE if move is None else canonicalMove(state, cols, move), min(length, 0xffff))
+
+	#Keep every position on the way to a win, with the moves (engine moves from state) still left to make
+	def recordWin(self, state, moves) :
+		state = state.copy()
+		for i, move in enumerate(moves) :
+			self.record(state, WON, move, len(moves) - i)
+			state.apply(move)
+
+	#The moves of a known win from the position state is in, or None if the win is not known (or some of it was given up)
+	def solution(self, state) :
+		state = state.copy()
+		moves = []
+		left = None
+		while not state.won() :
+			entry = self.lookup(state)
+			#Every move must bring the win closer, or a hash collision has sent the moves round in a loop
+			if entry is None or entry.kind != WON or entry.move is None or (left is not None and entry.length >= left) : return None
+			left = entry.length
+			moves.append(entry.move)
+			state.apply(entry.move)
+		return moves
+
+	#The number of entries of each kind
+	def counts(self) :
+		counts = dict((kind, 0) for kind in KIND_NAMES)
+		for index in range(self.slots) :
+			slot = self.readSlot(index)
+			if slot : counts[slot[4]] += 1
+		return counts
+
+
+if __name__ == "__main__":
+	for path in sys.argv[1 : ] :
+		store = Memo(path, read_only = True)
+		counts = store.counts()
+		print('%s: %d of %d slots used, %s' % (path, sum(counts.values()), store.slots,
+			', '.join('%d %s' % (counts[kind], KIND_NAMES[kind]) for kind in sorted(counts))))
+		store.close()
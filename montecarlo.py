@@ -0,0 +1,249 @@
+#Estimates how often Klondike is won by playing a simple policy on a lot of deals at once, with numpy arrays rather than engine.Klondike objects
+#This needs numpy (the game does not)
+#python montecarlo.py --games 100000                                  draw 1 against draw 3, playing greedily
+#python montecarlo.py --games 20000 --policy greedy random --seed 7   and against random play
+#python montecarlo.py --variant klondike vegas                        any of the variants with a stock (see variants.py)
+#The deals are the seeded deals of the game (see engine.shuffled), seeds FIRST up to FIRST + games, so a deal can be looked at in game.py
+#Every game plays one move per step, all the games that are still going stepping together:
+#	greedy: cards to the foundations, then moving a whole faceup run to turn up a facedown card or empty a column, then the waste to the tableau
+#	random: any one of those moves, picked at random
+#Only when there is none of those is a card drawn from the stock (recycling the waste when the stock is empty, if the variant allows another pass)
+#A game is over when it is won, or the whole stock has been gone through without a move other than drawing
+#Facedown cards are turned up as soon as they are uncovered, and cards never come back off the foundations
+#Cards go onto the columns by the stack table of the rules of the variant, the foundations are built up by suit as in Klondike
+#Win rates come with a 95% Wilson score interval
+import argparse
+import math
+import sys
+import numpy as np
+import engine
+import variants
+from engine import STOCK, NONE
+
+COL_SIZE = 6 + 13 #The most cards a column can hold: 6 facedown and a run from king to ace
+TALON_SIZE = 52 - 28 #Cards left for the stock after dealing the columns
+MAX_STEPS = 2000 #Playouts always end well before this, it is only a guard
+
+#Per card lookup tables with an extra entry at the end for NONE (-1 indexes the last entry)
+RANKS = np.array(engine.RANK + [99])
+SUITS = np.array(engine.SUIT + [0])
+
+#The variants that deal a Klondike tableau and stock, which is all the playouts know how to play
+PLAYABLE = [variant.name for variant in variants.VARIANTS if variant.columns == list(range(1, STOCK + 1)) and variant.hidden == list(range(STOCK))]
+
+#The moves a game can pick from in a step, in the order greedy play prefers among moves of the same kind
+FOUND_COL = 0 #Top card of column i to the foundations is FOUND_COL + i
+FOUND_WASTE = FOUND_COL + STOCK
+RUN = FOUND_WASTE + 1 #The faceup run of column src onto column dst is RUN + src * STOCK + dst
+WASTE_COL = RUN + STOCK * STOCK #Top card of the waste onto column i is WASTE_COL + i
+DRAW = WASTE_COL + STOCK
+MOVES = DRAW + 1
+
+#How much greedy play wants each move (0 is never picked)
+PRIORITY = np.zeros(MOVES)
+PRIORITY[FOUND_COL : FOUND_WASTE + 1] = 4
+PRIORITY[RUN : WASTE_COL] = 3
+PRIORITY[WASTE_COL : DRAW] = 2
+PRIORITY[DRAW] = 1
+
+POLICIES = ['greedy', 'random']
+
+#The card codes of the deals of seeds, one deal per row in the order Game.populatePiles deals them
+def dealSeeds(seeds) :
+	return np.array([engine.shuffled(seed) for seed in seeds], np.int8)
+
+
+#The games being played, one per row of every array
+#The columns are held in cols (cards past length are NONE), with the hidden bottom cards facedown
+#The stock and waste are held as one row in the order the cards come up: waste bottom to top, then stock top to bottom
+#The first waste cards of it are the waste, so drawing and recycling only move where the waste ends
+class Playouts(object) :
+	def __init__(self, deals, variant) :
+		games = len(deals)
+		self.draw = variant.draw
+		self.recycle_limit = MAX_STEPS if variant.passes is None else variant.passes - 1
+		self.stack = np.array([list(row) for row in variant.rules.stack], bool) #stack[below, card] as in engine.Rules, NONE indexes the last row
+		self.cols = np.full((games, STOCK, COL_SIZE), NONE, np.int8)
+		self.length = np.zeros((games, STOCK), np.int64)
+		self.hidden = np.zeros((games, STOCK), np.int64)
+		marker = 0
+		for col in range(STOCK) :
+			self.cols[:, col, : col + 1] = deals[:, marker : marker + col + 1]
+			self.length[:, col] = col + 1
+			self.hidden[:, col] = col
+			marker += col + 1
+		self.talon = np.array(deals[:, : marker - 1 : -1]) #The stock is dealt with its last card on top
+		self.talon_length = np.full(games, TALON_SIZE)
+		self.waste = np.zeros(games, np.int64)
+		self.found = np.zeros((games, 4), np.int64) #Cards on the foundation of each suit
+		self.recycles = np.zeros(games, np.int64)
+		self.idle = np.zeros(games, np.int64) #Draws since the last other move
+		self.steps = np.zeros(games, np.int64)
+		self.playing = np.ones(games, bool)
+
+	def won(self) : return self.found.sum(axis = 1) == 52
+
+	#Play until every game is over
+	def run(self, policy, rng) :
+		for step in range(MAX_STEPS) :
+			if not self.playing.any() : break
+			self.step(policy, rng)
+		return self.won()
+
+	#Turn up the facedown cards that have been uncovered
+	def flip(self) :
+		uncovered = (self.length == self.hidden) & (self.hidden > 0)
+		self.hidden[uncovered] -= 1
+
+	#Every game that is still going makes one move
+	def step(self, policy, rng) :
+		self.flip()
+		rows = np.nonzero(self.playing)[0]
+		scores = self.legal(rows) * PRIORITY
+		if policy == 'random' : scores[:, : DRAW] = (scores[:, : DRAW] > 0) * (2 + rng.random((len(rows), DRAW)))
+		choice = scores.argmax(axis = 1)
+		over = scores[np.arange(len(rows)), choice] == 0
+		self.playing[rows[over]] = False
+		rows = rows[~over]
+		choice = choice[~over]
+		self.steps[rows] += 1
+
+		self.idle[rows] += 1
+		moved = choice != DRAW
+		self.idle[rows[moved]] = 0
+
+		self.drawCards(rows[~moved])
+		found = choice < RUN
+		self.toFoundation(rows[found], choice[found])
+		run = (choice >= RUN) & (choice < WASTE_COL)
+		self.moveRuns(rows[run], (choice[run] - RUN) // STOCK, (choice[run] - RUN) % STOCK)
+		waste = (choice >= WASTE_COL) & moved
+		self.wasteToColumn(rows[waste], choice[waste] - WASTE_COL)
+
+		self.playing[rows] = ~self.won()[rows]
+
+	#Which moves each of the games of rows can make, as a (rows, MOVES) array of 0 and 1
+	def legal(self, rows) :
+		games = len(rows)
+		cols = self.cols[rows]
+		length = self.length[rows]
+		hidden = self.hidden[rows]
+		found = self.found[rows]
+		tops = np.where(length > 0, np.take_along_axis(cols, np.maximum(length - 1, 0)[:, :, None], 2)[:, :, 0], NONE)
+		bases = np.where(length > hidden, np.take_along_axis(cols, np.minimum(hidden, COL_SIZE - 1)[:, :, None], 2)[:, :, 0], NONE)
+		waste_top = self.wasteTop(rows)
+
+		legal = np.zeros((games, MOVES))
+		legal[:, FOUND_COL : FOUND_WASTE] = (tops != NONE) & (np.take_along_axis(found, SUITS[tops], 1) == RANKS[tops])
+		legal[:, FOUND_WASTE] = (waste_top != NONE) & (found[np.arange(games), SUITS[waste_top]] == RANKS[waste_top])
+
+		#Can card (one per game) go onto each column
+		def onto(cards) :
+			card = cards[:, None]
+			return (card != NONE) & self.stack[tops, card]
+
+		for src in range(STOCK) :
+			runs = onto(bases[:, src])
+			runs[:, src] = False
+			runs &= (length > 0) | (hidden[:, src] > 0)[:, None] #A king already at the bottom of a column gains nothing from an empty one
+			legal[:, RUN + src * STOCK : RUN + (src + 1) * STOCK] = runs
+		legal[:, WASTE_COL : DRAW] = onto(waste_top)
+		#Going through the stock twice (from wherever the waste ends) turns up every card that drawing can reach
+		talon_length = self.talon_length[rows]
+		legal[:, DRAW] = (talon_length > 0) & (self.idle[rows] < 2 * (talon_length // self.draw + 2))
+		legal[:, DRAW] *= (self.waste[rows] < talon_length) | (self.recycles[rows] < self.recycle_limit)
+		return legal
+
+	#The top card of the waste of each game of rows (NONE if it is empty)
+	def wasteTop(self, rows) :
+		waste = self.waste[rows]
+		return np.where(waste > 0, self.talon[rows, np.maximum(waste - 1, 0)], NONE)
+
+	#Turn up the next cards of the stock, or recycle the waste when the stock is empty
+	def drawCards(self, rows) :
+		waste = self.waste[rows]
+		recycled = waste == self.talon_length[rows]
+		self.waste[rows] = np.where(recycled, 0, np.minimum(waste + self.draw, self.talon_length[rows]))
+		self.recycles[rows] += recycled
+
+	#Take the top card off the waste of each game of rows
+	def takeWaste(self, rows) :
+		index = np.arange(TALON_SIZE)
+		after = index >= (self.waste[rows] - 1)[:, None]
+		self.talon[rows] = np.take_along_axis(self.talon[rows], np.minimum(index + after, TALON_SIZE - 1), 1)
+		self.talon_length[rows] -= 1
+		self.talon[rows, self.talon_length[rows]] = NONE
+		self.waste[rows] -= 1
+
+	def toFoundation(self, rows, choice) :
+		from_waste = choice == FOUND_WASTE
+		waste_rows = rows[from_waste]
+		self.found[waste_rows, SUITS[self.wasteTop(waste_rows)]] += 1
+		self.takeWaste(waste_rows)
+
+		rows = rows[~from_waste]
+		cols = choice[~from_waste] - FOUND_COL
+		top = self.length[rows, cols] - 1
+		self.found[rows, SUITS[self.cols[rows, cols, top]]] += 1
+		self.cols[rows, cols, top] = NONE
+		self.length[rows, cols] = top
+
+	#Move the faceup run of column src onto column dst (one pair per game of rows)
+	def moveRuns(self, rows, src, dst) :
+		first = self.hidden[rows, src]
+		num = self.length[rows, src] - first
+		end = self.length[rows, dst]
+		for i in range(num.max() if len(rows) else 0) :
+			more = i < num
+			self.cols[rows[more], dst[more], end[more] + i] = self.cols[rows[more], src[more], first[more] + i]
+			self.cols[rows[more], src[more], first[more] + i] = NONE
+		self.length[rows, dst] = end + num
+		self.length[rows, src] = first
+
+	def wasteToColumn(self, rows, cols) :
+		self.cols[rows, cols, self.length[rows, cols]] = self.wasteTop(rows)
+		self.length[rows, cols] += 1
+		self.takeWaste(rows)
+
+
+#The 95% Wilson score interval of a win rate
+def wilson(wins, games, z = 1.96) :
+	if not games : return (0.0, 1.0)
+	rate = wins / float(games)
+	centre = rate + z * z / (2 * games)
+	spread = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games))
+	scale = 1 + z * z / games
+	return ((centre - spread) / scale, (centre + spread) / scale)
+
+#Play the deals of seeds with a variant and policy, batch deals at a time (the arrays of a batch take about 200 bytes per deal)
+#Returns the number of games won and the mean number of cards put on the foundations
+def estimate(seeds, variant, policy, rng, batch = 50000) :
+	wins = 0
+	found = 0
+	for start in range(0, len(seeds), batch) :
+		games = Playouts(dealSeeds(seeds[start : start + batch]), variant)
+		wins += int(games.run(policy, rng).sum())
+		found += int(games.found.sum())
+	return wins, found / float(len(seeds)) if seeds else 0.0
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'Estimate Klondike win rates by playing out a lot of deals at once')
+	parser.add_argument('--games', type = int, default = 10000, help = 'deals to play per variant and policy')
+	parser.add_argument('--first', type = int, default = 0, help = 'seed of the first deal')
+	parser.add_argument('--variant', nargs = '+', choices = PLAYABLE, default = ['klondike', 'draw3'])
+	parser.add_argument('--policy', nargs = '+', choices = POLICIES, default = ['greedy'])
+	parser.add_argument('--seed', type = int, default = None, help = 'seed of the random policy')
+	parser.add_argument('--batch', type = int, default = 50000, help = 'deals played at once')
+	return parser.parse_args(argv)
+
+if __name__ == "__main__":
+	args = parseArgs(sys.argv[1 : ])
+	rng = np.random.default_rng(args.seed)
+	seeds = list(range(args.first, args.first + args.games))
+	print('%-8s %-8s %8s %8s %8s %18s %10s' % ('variant', 'policy', 'games', 'wins', 'rate', '95% interval', 'found'))
+	for name in args.variant :
+		for policy in args.policy :
+			wins, found = estimate(seeds, variants.variant(name), policy, rng, args.batch)
+			low, high = wilson(wins, len(seeds))
+			print('%-8s %-8s %8d %8d %7.2f%% %8.2f%% - %6.2f%% %10.2f' % (name, policy, len(seeds), wins,
+				100.0 * wins / len(seeds), 100 * low, 100 * high, found))
@@ -1,4 +1,7 @@
+import pygame
 import abstract
+import engine
+from general import SolSet
 from pygame.locals import *
 
 class Card(abstract.AbstractImage) :
@@ -14,34 +17,70 @@ class Card(abstract.AbstractImage) :
 		Card.back_of_card = abstract.loadImage(name)
 
 	#The two colors of the cards
-	RED = 1
-	BLACK = 2
+	RED = engine.RED
+	BLACK = engine.BLACK
 
+	#The card itself (number, suit and color) is the shared engine.CardId
+	#A Card only adds where the card is in this game and if it is faceup
 	def __init__(self, name, pos) :
 		#The name of the card is 01-13[cdhs]
 		#Notice that the image for the card is specified by its name
 		abstract.AbstractImage.__init__(self, name, pos, name)
 
+		self.id = engine.CARDS[engine.CODES[name]]
+		self.code = self.id.code #The card as the rules engine knows it
+
 		#Sometimes it is necessary to keep track of what pile a card is in
 		self.pile = None
 
-		self.faceUp = True
+		self.face_up = True
+
+	#Turning a card over changes how it is drawn
+	#The pile places its cards first, as a pile that was moved or laid out again has not yet put them where they are drawn
+	@property
+	def faceUp(self) : return self.face_up
+
+	@faceUp.setter
+	def faceUp(self, boolean) :
+		if boolean != self.face_up :
+			if self.pile : self.pile.place()
+			abstract.dirty.mark(self.rect)
+			if self.pile : self.pile.cardChanged(self)
+		self.face_up = boolean
+
+	#The face of the card is only loaded when it is needed, a facedown card or one under other cards never decodes its image
+	#It is not kept by the card but asked for at every draw, so abstract.scaled_cache knows which images are used and can drop the others
+	@property
+	def image(self) :
+		return abstract.loadImage(self.image_name)
+
+	#The face is never set, setImage only sizes the card
+	@image.setter
+	def image(self, image) :
+		pass
+
+	#All the cards of a cardset are the size given by its config.txt, so nothing needs to be loaded to know the size
+	def setImage(self, image) :
+		self.rect.w, self.rect.h = abstract.scaledSize(SolSet.image_resolution)
+		return None
 
-	def getNumber(self) : return int(self.name[:-1])
+	def getNumber(self) : return self.id.number
 
-	def getSuit(self) : return self.name[-1]
+	#The suit is an index into the suits of general.cardNames()
+	def getSuit(self) : return self.id.suit
 
-	def getColor(self) :
-		if self.getSuit() == 'h' or self.getSuit() == 'd' : return Card.RED
-		return Card.BLACK
+	def getColor(self) : return self.id.color
 
 	def sameColor(self, card) :
-		return self.getColor() == card.getColor()
+		return self.id.color == card.id.color
 
 	def draw(self, screen) :
+		self.drawAt(screen, self.rect)
+
+	def drawAt(self, screen, pos) :
 		if self.visible :
 			image = self.image if self.faceUp else Card.back_of_card
-			screen.blit(image, self.rect)
+			screen.blit(image, pos)
 
 #Encodes the draw and discard pile of the game
 #The left draw pile if face down and upon click moves the top card onto the right discard pile faceup
@@ -54,6 +93,13 @@ class StartPile(abstract.AbstractMultiPile) :
 		abstract.AbstractMultiPile.__init__(self, name, pos, space)
 		self.setupPile(self.setupDraw(cards, bottom))
 		self.setupPile(self.setupDiscard(bottom))
+		self.state = None
+
+	#Both the piles are linked to the rules engine, as the stock and waste
+	def bind(self, state) :
+		self.state = state
+		self.piles[StartPile.DRAW].bind(state, engine.STOCK)
+		self.piles[StartPile.DISCARD].bind(state, engine.WASTE)
 
 	#For the two setup functions, the position does not matter, as the setupPile function will correctly position the piles
 	def setupDraw(self, cards, bottom) :
@@ -66,11 +112,17 @@ class StartPile(abstract.AbstractMultiPile) :
 		return discard_pile
 
 	# If the draw pile is clicked 
+	#The rules engine says how many cards are turned up (or if the discard pile can go back at all, in a variant with few passes)
 	def drawUpClick(self) :
-		if not self.piles[StartPile.DRAW].isEmpty() : 
-			take_cards = self.piles[StartPile.DRAW].takeCards(1) #If the pile is not empty, get the top most card
-			take_cards[0].faceUp = True
-			self.piles[StartPile.DISCARD].addCards(take_cards) #Add the card to discard
+		draw_move = self.state.drawMove()
+		if draw_move is None : return
+		self.state.apply(draw_move)
+
+		if engine.source(draw_move) == engine.STOCK : #Turn the top cards faceup onto discard
+			take_cards = self.piles[StartPile.DRAW].takeCards(engine.number(draw_move))
+			take_cards.reverse()
+			for card in take_cards : card.faceUp = True
+			self.piles[StartPile.DISCARD].addCards(take_cards)
 
 		else : #Otherwise, move all the cards from discard to draw and but them facedowm
 			self.piles[StartPile.DISCARD].allFaceUp(False)
@@ -108,6 +160,9 @@ class StartPile(abstract.AbstractMultiPile) :
 	def validAddCards(self, cards) :
 		return False
 
+	def canAddCards(self, cards) :
+		return False
+
 	#I'm leaving this not implemented as there will never be a reason to call this function
 	#I could just delete it, but this will remind me that it should not exist
 	def addCards(self, cards) :
@@ -116,23 +171,19 @@ class StartPile(abstract.AbstractMultiPile) :
 
 #The 7 tiled piles that make up the main playing field
 class MainPile(abstract.AbstractTilePile) :
-	def __init__(self, name, pos, image, init_space, add_space, cards = []) :
-		self.pileSetup(cards)
+	def __init__(self, name, pos, image, init_space, add_space, cards = [], hidden = None) :
+		self.pileSetup(cards, hidden)
 		abstract.AbstractTilePile.__init__(self, name, pos, image, init_space, add_space, cards)
 
-	#All but the last card in the pile is facedown
-	def pileSetup(self, cards) :
-		for card in cards : card.faceUp = False
-		if cards: cards[-1].faceUp = True
+	#The first hidden cards in the pile are facedown, all but the last one when hidden is None
+	def pileSetup(self, cards, hidden = None) :
+		if hidden is None : hidden = len(cards) - 1
+		for i, card in enumerate(cards) : card.faceUp = i >= hidden
 
 	#This function returns the top most card on the deck that was clicked
 	#If no card was clicked, returns -1
 	def topCardClicked(self, pos) :
-		result = -1
-		for i, card in enumerate(self.cards) :
-			if card.hasPosition(pos) : result = i
-
-		return result
+		return self.cardAt(pos)
 
 	def onClick(self, event) :
 		if not self.visible : return
@@ -146,8 +197,9 @@ class MainPile(abstract.AbstractTilePile) :
 
 		#If the last card in the pile if face down, an upclick will turn in around
 		if event.type == MOUSEBUTTONUP and event.button == 1 :
-			if not self.isEmpty() and self.cards[-1].hasPosition(event.pos) :
+			if not self.isEmpty() and self.cardAt(event.pos) == self.cardNum() - 1 and not self.cards[-1].faceUp :
 				self.cards[-1].faceUp = True
+				self.state.apply(engine.flip(self.index))
 
 	#Returns the last card in the pile if it is faced up and has been clicked
 	def onDoubleClick(self, event) :
@@ -158,31 +210,22 @@ class MainPile(abstract.AbstractTilePile) :
 			return self.takeCards(1)
 
 	#can these cards be added to this pile by the user
-	#We only care about the first card in cards
-	#implicit assumption is that the rest of the program makes sure the order of the cards remains valid
+	#The rules engine decides if the move is legal (the cards are still in their source pile there)
+	#The first card in cards must then touch the top most card of the pile (or the pile itself when empty)
 	def validAddCards(self, cards) :
-		#Only a king can be added to an empty pile
-		if self.isEmpty() :
-			if cards[0].getNumber() == 13 and self.hasCollision(cards[0]) : 
-				return True
-		else :
-			ref_card = self.cards[-1] # The top most card of the pile determines validity
-			if not ref_card.faceUp : #Card must be faceup to be seen when it is added to
-				return False 
-
-			if not ref_card.sameColor(cards[0]) and ref_card.getNumber() == cards[0].getNumber() + 1 :
-				if ref_card.hasCollision(cards[0]) : 
-					return True
+		return self.canAddCards(cards) and self.touchesCards(cards)
 
-		return False
+	def canAddCards(self, cards) :
+		return self.state.canMove(cards[0].pile.index, self.index, len(cards))
+
+	def touchesCards(self, cards) :
+		return self.dropRect().colliderect(cards[0].rect)
 
 
 #A simple pile that only allows addition of one card with increasing value with the same suit
 #When empty, can accept only aces (the ace added will determine the suit)
-#Keeps track of how many cards have been added to any SuitPile (for the win condition of 52)
+#The cards on the foundations are counted by the rules engine (see Game.winCondition), so every game keeps its own count
 class SuitPile(abstract.AbstractSimplePile) :
-	total_cards = 0
-
 	def __init__(self, name, pos, image) :
 		abstract.AbstractSimplePile.__init__(self, name, pos, image)
 
@@ -191,17 +234,11 @@ class SuitPile(abstract.AbstractSimplePile) :
 	#This matters because double clicking a card can directly move it to a suit pile
 	def validAddCards(self, cards, contact = True) :
 		if contact : 
-			if not self.hasCollision(cards[0]): return False
-		if len(cards) != 1 : return False
+			if not self.touchesCards(cards): return False
+		return self.canAddCards(cards)
 
-		if self.isEmpty() :
-			if cards[0].getNumber() == 1: return True
-			return False
-
-		ref_card = self.cards[-1]
-		if ref_card.getSuit() == cards[0].getSuit() and ref_card.getNumber() + 1 == cards[0].getNumber() :
-			return True
-		return False
+	def canAddCards(self, cards) :
+		return self.state.canMove(cards[0].pile.index, self.index, len(cards))
 
 	#On click
 	def onClick(self, event) :
@@ -213,30 +250,32 @@ class SuitPile(abstract.AbstractSimplePile) :
 	def onDoubleClick(self, event) :
 		pass
 
-	#To keep track of the total number of cards in SuitPiles, add and take card function need to be expanded
-	def takeCards(self, num) :
-		cards_taken = super(SuitPile, self).takeCards(num)
-		SuitPile.total_cards -= num
-		return cards_taken
-
-	def addSingle(self, card) :
-		super(SuitPile, self).addSingle(card)
-		SuitPile.total_cards += 1
-			
 #This class allows for cards to be easily moved around
 #It takes cards from a pile and keeps them in the same relative positions while they are moved around
 #It also keeps track of where the cards came from and can return it if necessary
+#When cards are taken, the piles the rules allow them on are worked out once (self.targets), as that cannot change while they are moved
 class Repository(object) :
 	def __init__(self, name) :
 		self.name = name
 		self.cards = []
 		self.source = None
+		self.piles = [] #The piles of the game (see bind)
+		self.targets = [] #The piles the cards can be put on, in the order of self.piles
+		self.highlights = [] #The areas drawn around the targets (with SolSet.highlight_targets)
+
+	#The piles the cards may be put on
+	def bind(self, piles) :
+		self.piles = piles
 
 	def addCards(self, cards) :
 		if self.source or self.cards : raise Exception
 		if cards :
 			self.cards = cards
 			self.source = cards[0].pile
+			self.targets = [pile for pile in self.piles if pile.canAddCards(cards)]
+			if SolSet.highlight_targets :
+				self.highlights = [pile.dropRect().inflate(6, 6) for pile in self.targets]
+				for rect in self.highlights : abstract.dirty.mark(rect)
 
 	def hasCards(self) : 
 		if self.cards : return True
@@ -245,17 +284,24 @@ class Repository(object) :
 	def clear(self) :
 		self.cards = []
 		self.source = None
+		self.targets = []
+		for rect in self.highlights : abstract.dirty.mark(rect)
+		self.highlights = []
 
 	def returnCards(self) :
 		self.source.addCards(self.cards)
 		self.clear()
 
 	#Move the card to the pile (please check if the move if valid first)
+	#The move is also made in the rules engine, unless the cards are just put back
 	def addToPile(self, pile) :
+		if pile is not self.source :
+			pile.state.apply(engine.move(self.source.index, pile.index, len(self.cards)))
 		pile.addCards(self.cards)
 		self.clear()
  
 	def draw(self, screen) :
+		for rect in self.highlights : pygame.draw.rect(screen, SolSet.highlight_color, rect, 3)
 		for card in self.cards : card.draw(screen)
 
 	def movePosition(self, move) :
@@ -0,0 +1,132 @@
+#Plays an input log (see inputlog.py) through the real game loop without a window (SDL's dummy video driver)
+#python game.py --record session.log                  play and record a session
+#python replay.py session.log                         replay it as fast as possible
+#python replay.py session.log --realtime --dirty      replay it at the recorded pace, drawing with dirty rects
+#python replay.py session.log --profile trace.json    and write a trace of every frame (see instrument.py)
+#Every deal is made by the variant it was recorded with, whatever SolSet.variant is
+#Each recorded event is handed to the game as a frame of its own, and the time from handing it over to the frame being drawn is its latency
+#A run of recorded mouse motion is one frame, merged into one event as the game merges it (see game.coalesceMotion)
+#Double clicks are taken from the log rather than from the clock, as the replay is much faster than the player was
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import sys
+import time
+import inputlog
+import instrument
+import game
+import variants
+from general import SolSet
+
+#Raised when the log runs out, which ends the game loop
+class EndOfLog(Exception) :
+	pass
+
+
+#Hands the game loop one recorded event (or run of motion) per frame, and measures how long each frame took
+class ReplayScheduler(object) :
+	def __init__(self, records, realtime) :
+		self.records = records
+		self.realtime = realtime
+		self.next = 0
+		self.record = None #The record of the current frame
+		self.start = 0.0
+		self.began = time.perf_counter()
+		self.latencies = dict((kind, []) for kind in range(len(inputlog.KIND_NAMES)))
+		self.frame_time = 0.0
+		self.average_time = 0.0
+		self.frame = instrument.NULL_SPAN
+
+	def events(self, busy) :
+		if self.next == len(self.records) : raise EndOfLog
+		first = self.next
+		self.next += 1
+		if self.records[first].kind == inputlog.MOTION :
+			while self.next < len(self.records) and self.records[self.next].kind == inputlog.MOTION : self.next += 1
+		self.record = self.records[self.next - 1]
+		if self.realtime :
+			wait = self.record.time / 1000.0 - (time.perf_counter() - self.began)
+			if wait > 0 : time.sleep(wait)
+		self.frame = instrument.span('frame').begin()
+		self.start = time.perf_counter()
+		return game.coalesceMotion([record.event() for record in self.records[first : self.next]])
+
+	def endFrame(self, busy) :
+		self.frame_time = time.perf_counter() - self.start
+		self.average_time += (self.frame_time - self.average_time) * 0.05
+		self.latencies[self.record.kind].append(self.frame_time)
+		self.frame.end()
+
+
+#Says a click was a double click exactly when it was one in the recorded session
+class ReplayDoubleClick(object) :
+	def __init__(self, scheduler) :
+		self.scheduler = scheduler
+		self.wasDC = False
+
+	def isDC(self, event) :
+		self.wasDC = self.scheduler.record.isDouble()
+		return self.wasDC
+
+
+#A Game that is dealt the recorded deals (by the recorded variants) and gets its input from the log
+class ReplayGame(game.Game) :
+	def __init__(self, records, realtime = False) :
+		self.deals = [record.data for record in records if record.kind == inputlog.DEAL]
+		if not self.deals : raise ValueError('The log has no deal')
+		if any(variant >= len(variants.VARIANTS) for seed, variant in self.deals) : raise ValueError('The log has a deal of an unknown variant')
+		game.Game.__init__(self)
+		self.scheduler = ReplayScheduler([record for record in records if record.kind != inputlog.DEAL], realtime)
+		self.double_click = ReplayDoubleClick(self.scheduler)
+
+	#The next recorded deal, which is made by the variant it was recorded with
+	def nextSeed(self) :
+		seed, variant = self.deals.pop(0)
+		SolSet.variant = variants.VARIANTS[variant].name
+		return seed
+
+	#Play the log through the game loop, returns the scheduler with the latencies
+	def replay(self) :
+		try : self.gameLoop()
+		except EndOfLog : pass
+		return self.scheduler
+
+
+#A value at fraction of the way through sorted values
+def percentile(values, fraction) :
+	return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def report(scheduler, seconds) :
+	total = sum(len(times) for times in scheduler.latencies.values())
+	print('%d events in %.3f seconds, %.0f events per second' % (total, seconds, total / seconds if seconds else 0))
+	print('')
+	print('%-8s %8s %10s %10s %10s %10s %10s' % ('event', 'count', 'mean us', 'p50 us', 'p90 us', 'p99 us', 'max us'))
+	for kind, times in sorted(scheduler.latencies.items()) :
+		if not times : continue
+		times = sorted(times)
+		mean = sum(times) / len(times)
+		print('%-8s %8d %10.1f %10.1f %10.1f %10.1f %10.1f' % (inputlog.KIND_NAMES[kind], len(times), mean * 1e6,
+			percentile(times, 0.5) * 1e6, percentile(times, 0.9) * 1e6, percentile(times, 0.99) * 1e6, times[-1] * 1e6))
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'Replay an input log through the game loop')
+	parser.add_argument('log', help = 'input log written by game.py --record')
+	parser.add_argument('--realtime', action = 'store_true', help = 'keep to the recorded timing instead of going as fast as possible')
+	parser.add_argument('--dirty', action = 'store_true', help = 'draw with dirty rects (SolSet.dirty_rects)')
+	parser.add_argument('--profile', metavar = 'FILE', help = 'write a trace of the replay to FILE')
+	return parser.parse_args(argv)
+
+if __name__ == "__main__":
+	args = parseArgs(sys.argv[1 : ])
+	SolSet.dirty_rects = args.dirty
+	replay_game = ReplayGame(list(inputlog.readLog(args.log)), args.realtime)
+	if args.profile : instrument.start()
+	start = time.perf_counter()
+	scheduler = replay_game.replay()
+	report(scheduler, time.perf_counter() - start)
+	if args.profile :
+		instrument.saveTrace(args.profile)
+		print('')
+		print(instrument.summary())
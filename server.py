@@ -0,0 +1,204 @@
+#Hosts many games of Klondike at once on one asyncio event loop, for bots to play over a local socket
+#python server.py                                    serve on 127.0.0.1:7777
+#python server.py --unix /tmp/solitaire.sock        serve on a unix socket
+#python server.py --load 50 --tables 2000            play random bots against a running server and report how fast it went
+#Each table is a session holding its own engine.Klondike (no pygame and no display), owned by the connection that made it and closed with it
+#The protocol is a line per request and a line per reply, in the same order, so a client can send many requests before reading the replies
+#	NEW [seed] [draw]     -> OK id seed draw PILES          a new table (a random seed if none is given, drawing one card by default)
+#	STATE id              -> OK id seed draw PILES          the whole table
+#	MOVES id              -> OK id move move ...            the legal moves
+#	MOVE id move          -> OK id won PILES                make a move, the reply holds only the piles that changed
+#	DRAW id               -> OK id won PILES                click the stock (draw, or turn the waste over)
+#	CLOSE id              -> OK id
+#	STATS                 -> OK tables moves connections
+#Anything wrong gets ERR and what was wrong instead
+#A move is an engine move as a decimal number (src | dst << 4 | num << 8, see engine.py), won is 1 once all the cards are on the foundations
+#A pile is written as number:facedown:cards, the cards bottom to top as two hex digits per card code (see engine.py), for example 6:6:1e0433
+import argparse
+import asyncio
+import random
+import sys
+import time
+import engine
+from engine import STOCK, PILES
+
+#One game being played
+class Session(object) :
+	__slots__ = ('ident', 'seed', 'state', 'moves')
+
+	def __init__(self, ident, seed, draw) :
+		self.ident = ident
+		self.seed = seed
+		self.state = engine.Klondike.deal(engine.shuffled(seed), draw)
+		self.moves = 0
+
+	#Can move be made (the rules engine leaves flipping and drawing to the caller)
+	def isLegal(self, move) :
+		state = self.state
+		src = engine.source(move)
+		dst = engine.dest(move)
+		if src >= PILES or dst >= PILES : return False
+		if engine.isFlip(move) :
+			return src < STOCK and engine.number(move) == 0 and 0 < len(state.piles[src]) == state.hidden[src]
+		if src == STOCK or dst == STOCK : return move == state.drawMove()
+		return state.canMove(src, dst, engine.number(move))
+
+	#Make a move, returns the piles it changed
+	def move(self, move) :
+		if not self.isLegal(move) : raise ValueError('illegal move ' + str(move))
+		self.state.apply(move)
+		self.moves += 1
+		if engine.isFlip(move) : return [engine.source(move)]
+		return [engine.source(move), engine.dest(move)]
+
+	def pileText(self, pile) :
+		state = self.state
+		return '%d:%d:%s' % (pile, state.hidden[pile] if pile < STOCK else 0, bytes(state.piles[pile]).hex())
+
+	def stateText(self) :
+		return '%d %d %d %s' % (self.ident, self.seed, self.state.draw, ' '.join(self.pileText(pile) for pile in range(PILES)))
+
+
+#The tables of every connection, and what the handlers of the requests do with them
+class Server(object) :
+	def __init__(self, max_tables) :
+		self.max_tables = max_tables
+		self.tables = {}
+		self.next_ident = 1
+		self.moves = 0
+		self.connections = 0
+
+	def newTable(self, owned, args) :
+		if len(self.tables) >= self.max_tables : raise ValueError('too many tables')
+		seed = int(args[0]) if args else random.getrandbits(32)
+		draw = int(args[1]) if len(args) > 1 else 1
+		if not 0 <= seed < 1 << 32 : raise ValueError('the seed must fit into 32 bits')
+		if draw < 1 : raise ValueError('draw must be at least 1')
+		session = Session(self.next_ident, seed, draw)
+		self.next_ident += 1
+		self.tables[session.ident] = session
+		owned.add(session.ident)
+		return session.stateText()
+
+	#The table a request is about (only the connection that made a table can play it)
+	def table(self, owned, args) :
+		if not args : raise ValueError('no table given')
+		ident = int(args[0])
+		if ident not in owned : raise ValueError('no table ' + args[0])
+		return self.tables[ident]
+
+	def played(self, session, changed) :
+		self.moves += 1
+		return '%d %d %s' % (session.ident, session.state.won(), ' '.join(session.pileText(pile) for pile in changed))
+
+	#The reply to one request line
+	def handle(self, owned, line) :
+		words = line.split()
+		if not words : return 'ERR empty request'
+		command = words[0].upper()
+		args = words[1 : ]
+		try :
+			if command == 'NEW' : return 'OK ' + self.newTable(owned, args)
+			if command == 'STATS' : return 'OK %d %d %d' % (len(self.tables), self.moves, self.connections)
+			session = self.table(owned, args)
+			if command == 'STATE' : return 'OK ' + session.stateText()
+			if command == 'MOVES' : return 'OK %d %s' % (session.ident, ' '.join(str(move) for move in session.state.moves()))
+			if command == 'MOVE' :
+				if len(args) < 2 : raise ValueError('no move given')
+				return 'OK ' + self.played(session, session.move(int(args[1])))
+			if command == 'DRAW' :
+				move = session.state.drawMove()
+				if move is None : raise ValueError('the stock and waste are empty')
+				return 'OK ' + self.played(session, session.move(move))
+			if command == 'CLOSE' :
+				self.close(owned, session.ident)
+				return 'OK %d' % session.ident
+			return 'ERR unknown request ' + words[0]
+		except ValueError as error :
+			return 'ERR ' + str(error)
+
+	def close(self, owned, ident) :
+		owned.discard(ident)
+		del self.tables[ident]
+
+	#Serve one connection until it closes, its tables go with it
+	#Replies go out as soon as they are written, the connection is only held up when a client stops reading them
+	#Anything wrong with a request is answered with ERR (see handle), only losing the connection ends it
+	async def serve(self, reader, writer) :
+		owned = set()
+		self.connections += 1
+		try :
+			while True :
+				try : line = await reader.readline()
+				except ValueError : reply = 'ERR request too long' #The reader drops a line longer than its limit
+				else :
+					if not line : break
+					reply = self.handle(owned, line.decode('ascii', 'replace'))
+				#Replies can echo what the client sent, which is not always ascii
+				writer.write((reply + '\n').encode('ascii', 'replace'))
+				if writer.transport.get_write_buffer_size() > 1 << 16 : await writer.drain()
+		except ConnectionError :
+			pass
+		finally :
+			for ident in list(owned) : self.close(owned, ident)
+			self.connections -= 1
+			writer.close()
+
+
+async def serveForever(args) :
+	server = Server(args.max_tables)
+	if args.unix : listener = await asyncio.start_unix_server(server.serve, args.unix)
+	else : listener = await asyncio.start_server(server.serve, args.host, args.port)
+	async with listener : await listener.serve_forever()
+
+
+#A bot that opens tables and makes random legal moves on all of them, sending a request for every table before reading the replies
+#Returns the number of requests made
+async def randomBot(args, tables, moves, rng) :
+	if args.unix : reader, writer = await asyncio.open_unix_connection(args.unix)
+	else : reader, writer = await asyncio.open_connection(args.host, args.port)
+
+	async def ask(lines) :
+		writer.write(''.join(line + '\n' for line in lines).encode('ascii'))
+		replies = [(await reader.readline()).decode('ascii').split() for line in lines]
+		for reply in replies :
+			if reply[0] != 'OK' : raise RuntimeError(' '.join(reply))
+		return replies
+
+	idents = [int(reply[1]) for reply in await ask(['NEW %d' % rng.getrandbits(32) for i in range(tables)])]
+	requests = tables
+	for i in range(moves) :
+		if not idents : break
+		options = await ask(['MOVES %d' % ident for ident in idents])
+		playing = [(ident, reply[2 : ]) for ident, reply in zip(idents, options) if len(reply) > 2]
+		results = await ask(['MOVE %d %s' % (ident, rng.choice(legal)) for ident, legal in playing])
+		requests += len(idents) + len(playing)
+		idents = [int(reply[1]) for reply in results if reply[2] == '0']
+	writer.close()
+	return requests
+
+async def loadTest(args) :
+	rng = random.Random(args.seed)
+	start = time.perf_counter()
+	bots = [randomBot(args, args.tables // args.load, args.moves, random.Random(rng.getrandbits(32))) for i in range(args.load)]
+	requests = sum(await asyncio.gather(*bots))
+	seconds = time.perf_counter() - start
+	print('%d bots, %d tables, %d requests in %.2f seconds, %.0f requests per second' % (args.load,
+		args.tables // args.load * args.load, requests, seconds, requests / seconds))
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'Serve many Klondike tables at once over a local socket')
+	parser.add_argument('--host', default = '127.0.0.1')
+	parser.add_argument('--port', type = int, default = 7777)
+	parser.add_argument('--unix', metavar = 'PATH', help = 'serve on (or connect to) a unix socket rather than TCP')
+	parser.add_argument('--max-tables', type = int, default = 100000, help = 'tables open at once, over all connections')
+	parser.add_argument('--load', type = int, metavar = 'BOTS', help = 'connect this many random bots to a running server instead of serving')
+	parser.add_argument('--tables', type = int, default = 1000, help = 'tables the bots play, shared out between them')
+	parser.add_argument('--moves', type = int, default = 200, help = 'moves each bot makes per table')
+	parser.add_argument('--seed', type = int, default = None, help = 'seed of the bots')
+	return parser.parse_args(argv)
+
+if __name__ == "__main__":
+	args = parseArgs(sys.argv[1 : ])
+	try : asyncio.run(loadTest(args) if args.load else serveForever(args))
+	except KeyboardInterrupt : pass
@@ -0,0 +1,437 @@
+#Finds out if a deal can be won, by a depth first search over the states of the rules engine (see engine.py)
+#Safe moves to the foundations and flips are made automatically, and the stock is searched as a whole:
+#every card that can be turned up (recycling the waste if needed) is a single candidate move
+#Moves that cannot help are never tried: kings moving between empty columns and cards taken back off the foundations that are no longer needed
+#Two kinds of move that could help in rare deals are left out as well, to keep the search small:
+#moving only part of a faceup run, unless that frees a card for the foundations (faceup cards that are not a run can always be split),
+#and (when drawing more than one card) keeping a card on the waste that could go to the foundations, which would change the cards drawn after it
+#A search that left one of those out and found no win ends EXHAUSTED, only a search that left nothing out calls a deal unwinnable
+#A deal called winnable always comes with a win
+#How long a deal takes varies a lot: of seeds 0 - 39 drawing one card, with a budget of 200000 nodes (about 55000 nodes a second),
+#28 were won (half of them in 3 ms, the slowest in 2.8 s), 1 was exhausted after 2.5 s and 11 ran out of budget after 3 - 5 s each
+#(given 1500000 nodes, 2 of 5 of those were won, in 1 s and 12 s, the other 3 ran out after about 30 s)
+#So deals are best filtered ahead of time (see batch.py and memo.py), not while a player waits for one
+import random
+import time
+import engine
+from memo import WON, DEAD
+from engine import RANK, SUIT, COLOR, NONE, STOCK, WASTE, FOUNDATION, PILES
+
+WINNABLE = 'winnable'
+UNWINNABLE = 'unwinnable'
+EXHAUSTED = 'exhausted' #No win was found, but moves were left out that might have led to one
+UNKNOWN = 'unknown' #The node or time budget ran out
+
+#Where safe moves to the foundations are looked for
+AUTO_SOURCES = list(range(STOCK)) + [WASTE]
+
+#The random numbers the key of a position is made of (see Solver.stateKey), the same in every run so a search can be repeated
+#Rows of 53 are indexed by a card or by NONE (-1), which is the last one
+_zobrist = random.Random(0x50117a12e)
+def zobristTable(rows, columns = None) :
+	if columns is None : return [_zobrist.getrandbits(64) for row in range(rows)]
+	return [[_zobrist.getrandbits(64) for column in range(columns)] for row in range(rows)]
+
+Z_BELOW = zobristTable(52, 53) #A tableau card on a card (or at the bottom of its column)
+Z_DOWN = zobristTable(52) #A tableau card that is facedown
+Z_FOUND = zobristTable(52) #A card on the foundations
+Z_CYCLE = zobristTable(52, 53) #A card after another one in the talon (or the first one), see Solver.candidates
+Z_WASTE = zobristTable(53) #How many cards of the talon are on the waste
+Z_RECYCLES = zobristTable(256) #The times the waste was turned over
+
+#What the solver found out about a deal
+#moves is the list of engine moves that wins the game from the position given (None unless winnable)
+class Result(object) :
+	def __init__(self, verdict, moves, nodes, seconds) :
+		self.verdict = verdict
+		self.moves = moves
+		self.nodes = nodes
+		self.seconds = seconds
+
+	def __repr__(self) :
+		return 'Result(%s, %d nodes, %.3fs)' % (self.verdict, self.nodes, self.seconds)
+
+
+#The set of states that have already been searched, holding at most size keys
+#Keys are kept in two generations: when the new one is full, the old one is dropped
+#Keys that are looked up again are moved into the new generation, so often seen states survive
+class TranspositionTable(object) :
+	def __init__(self, size) :
+		self.size = size
+		self.new = set()
+		self.old = set()
+		self.evictions = 0
+
+	def __len__(self) : return len(self.new) + len(self.old)
+
+	def __contains__(self, key) :
+		if key in self.new : return True
+		if key in self.old :
+			self.add(key)
+			return True
+		return False
+
+	def add(self, key) :
+		self.new.add(key)
+		if len(self.new) >= self.size // 2 :
+			self.evictions += len(self.old)
+			self.old = self.new
+			self.new = set()
+
+
+#One level of the search: the moves that got to this state, and the candidates left to try from it
+class Frame(object) :
+	__slots__ = ('moves', 'key', 'candidates', 'next')
+
+	def __init__(self, moves, key, candidates) :
+		self.moves = moves
+		self.key = key
+		self.candidates = candidates
+		self.next = 0
+
+
+#A search that can be run a slice at a time with step(), or to the end with run()
+#position is either an engine.Klondike or the piles of a Game (as returned by Game.populatePiles), which are bound to one
+#With a memo.Memo, a position it knows the verdict of is not searched, and the verdicts found are kept in it
+class Solver(object) :
+	def __init__(self, position, max_nodes = 1000000, max_time = None, table_size = 1000000, memo = None) :
+		if isinstance(position, engine.Klondike) : self.state = position.copy()
+		else : self.state = position[0].state.copy()
+		self.root = self.state.copy() #The position searched from
+		self.memo = memo
+		#When drawing one card at a time every card of the talon can always be reached, so where the waste ends does not matter
+		self.whole_talon = self.state.draw == 1 and self.state.passes is None
+		self.key = self.stateKey() #Kept up to date by make and unmake
+
+		self.max_nodes = max_nodes
+		self.max_time = max_time
+		self.table = TranspositionTable(table_size)
+		self.path = set() #Keys of the states on the current path, so the search never loops
+		self.nodes = 0
+		self.seconds = 0.0
+		self.pruned = False #Has a move that might have helped been left out
+		self.result = None
+
+		self.stack = []
+		if self.recall() : return
+		forced = self.autoMoves()
+		if self.state.won() : self.result = Result(WINNABLE, forced, 0, 0.0)
+		else : self.stack = [self.newFrame(forced)]
+
+	#Take the verdict from the memo if it has one
+	def recall(self) :
+		if self.memo is None : return False
+		known = self.memo.lookup(self.state)
+		if known is None : return False
+		if known.kind == DEAD : self.result = Result(UNWINNABLE, None, 0, 0.0)
+		elif known.kind == WON :
+			moves = self.memo.solution(self.state)
+			if moves is None : return False
+			self.result = Result(WINNABLE, moves, 0, 0.0)
+		return self.result is not None
+
+	def newFrame(self, moves) :
+		key = self.key
+		self.table.add(key)
+		self.path.add(key)
+		return Frame(moves, key, self.candidates())
+
+	#Search until the verdict is known or num more nodes have been searched
+	#Returns the Result, or None if the search is not finished yet
+	def step(self, num) :
+		if self.result : return self.result
+		start = time.time()
+		state = self.state
+		stack = self.stack
+		table = self.table
+		limit = min(self.nodes + num, self.max_nodes)
+
+		while self.nodes < limit :
+			frame = stack[-1]
+			if frame.next == len(frame.candidates) :
+				#Nothing left to try from here, go back up
+				stack.pop()
+				self.path.discard(frame.key)
+				for move in reversed(frame.moves) : self.unmake(move)
+				if not stack : return self.finish(EXHAUSTED if self.pruned else UNWINNABLE, None, start)
+				continue
+
+			candidate = frame.candidates[frame.next]
+			frame.next += 1
+			self.nodes += 1
+			for move in candidate : self.make(move)
+			moves = candidate + self.autoMoves()
+
+			if state.won() :
+				solution = []
+				for done in stack : solution.extend(done.moves)
+				return self.finish(WINNABLE, solution + moves, start)
+
+			key = self.key
+			if key in self.path or key in table :
+				for move in reversed(moves) : self.unmake(move)
+				continue
+			stack.append(self.newFrame(moves))
+
+		self.seconds += time.time() - start
+		if self.nodes >= self.max_nodes or (self.max_time is not None and self.seconds >= self.max_time) :
+			return self.finish(UNKNOWN, None, None)
+
+	#Search until the verdict is known (or the node or time budget runs out)
+	def run(self) :
+		result = self.step(1024)
+		while result is None : result = self.step(1024)
+		return result
+
+	def finish(self, verdict, moves, start) :
+		if start is not None : self.seconds += time.time() - start
+		if moves is not None : moves = expandDraws(moves, self.state.draw)
+		self.result = Result(verdict, moves, self.nodes, self.seconds)
+		if self.memo :
+			if verdict == WINNABLE : self.memo.recordWin(self.root, moves)
+			elif verdict == UNWINNABLE : self.memo.record(self.root, DEAD)
+		self.stack = []
+		self.path.clear()
+		return self.result
+
+	#The key of the current state in the transposition table, a 64 bit hash of what the search needs to tell positions apart
+	#It is the xor of a random number (see Z_BELOW and the rest) for every fact about the position:
+	#	each tableau card is on some card (or at the bottom of a column), and facedown or not, whatever the column is
+	#	so columns that are swapped round give the same key, the game goes on the same way from either
+	#	each card on the foundations is there, whichever foundation it is on
+	#	each card of the talon (the waste and then the stock from the top down) comes after some card, and the waste holds so many of them
+	#	(unless the whole talon can always be reached, see whole_talon), and the times the waste was turned over if passes are limited
+	#A move only changes a few of those facts, so the key is kept up to date a move at a time (see keyChange) instead of worked out for every node
+	#Two positions could get the same key, but with 64 bits that is not expected to happen in any search that fits into memory
+	def stateKey(self) :
+		state = self.state
+		piles = state.piles
+		key = 0
+		for col in range(STOCK) :
+			below = NONE
+			for i, card in enumerate(piles[col]) :
+				key ^= Z_BELOW[card][below]
+				if i < state.hidden[col] : key ^= Z_DOWN[card]
+				below = card
+		before = NONE
+		for card in piles[WASTE] + piles[STOCK][ : : -1] :
+			key ^= Z_CYCLE[card][before]
+			before = card
+		if not self.whole_talon : key ^= Z_WASTE[len(piles[WASTE])]
+		if state.passes is not None : key ^= Z_RECYCLES[state.recycles]
+		for pile in range(FOUNDATION, PILES) :
+			for card in piles[pile] : key ^= Z_FOUND[card]
+		return key
+
+	#What making move changes the key by (the xor of the facts it ends and starts), worked out in the position before the move is made
+	def keyChange(self, move) :
+		state = self.state
+		piles = state.piles
+		src = move & 15
+		dst = move >> 4 & 15
+		if src == dst : return Z_DOWN[piles[src][state.hidden[src] - 1]]
+		num = move >> 8
+
+		#Drawing and turning the waste over keep the order of the talon
+		waste = len(piles[WASTE])
+		if src == STOCK : return 0 if self.whole_talon else Z_WASTE[waste] ^ Z_WASTE[waste + num]
+		if dst == STOCK :
+			change = 0 if self.whole_talon else Z_WASTE[waste] ^ Z_WASTE[0]
+			if state.passes is not None : change ^= Z_RECYCLES[state.recycles] ^ Z_RECYCLES[state.recycles + 1]
+			return change
+
+		cards = piles[src]
+		card = cards[-num]
+		if src < STOCK : change = Z_BELOW[card][cards[-num - 1] if len(cards) > num else NONE]
+		elif src == WASTE :
+			#The card leaves the talon, the one after it now comes after the one before it
+			before = cards[-2] if waste > 1 else NONE
+			change = Z_CYCLE[card][before]
+			stock = piles[STOCK]
+			if stock : change ^= Z_CYCLE[stock[-1]][card] ^ Z_CYCLE[stock[-1]][before]
+			if not self.whole_talon : change ^= Z_WASTE[waste] ^ Z_WASTE[waste - 1]
+		else : change = Z_FOUND[card]
+
+		if dst < STOCK : change ^= Z_BELOW[card][piles[dst][-1] if piles[dst] else NONE]
+		else : change ^= Z_FOUND[card]
+		return change
+
+	#Make a move or take it back, keeping self.key up to date
+	def make(self, move) :
+		self.key ^= self.keyChange(move)
+		self.state.apply(move)
+
+	def unmake(self, move) :
+		self.state.undo(move)
+		self.key ^= self.keyChange(move)
+
+	#A card never needs to be in the tableau once both the cards of the other color that could go on it are on the foundations
+	def isSafe(self, card, counts) :
+		rank = RANK[card]
+		if rank <= 1 : return True
+		if COLOR[card] == engine.RED : return counts[2] >= rank and counts[3] >= rank
+		return counts[0] >= rank and counts[1] >= rank
+
+	#The cards that can go onto the foundations now, with the foundation each goes onto
+	#Cards that start a foundation only need to try the first empty one, they are all the same
+	def foundTargets(self) :
+		founding = self.state.rules.founding
+		piles = self.state.piles
+		targets = {}
+		empty = None
+		for pile in range(FOUNDATION, PILES) :
+			if not piles[pile] :
+				if empty is None : empty = pile
+				continue
+			for card in founding[piles[pile][-1]] : targets[card] = pile
+		if empty is not None :
+			for card in founding[NONE] : targets.setdefault(card, empty)
+		return targets
+
+	#Make the moves that never need to be taken back: flipping facedown cards and safe moves to the foundations
+	#The foundation counts and targets of the position this ends in are kept (self.counts and self.targets) for candidates,
+	#which is always called in the position autoMoves left
+	def autoMoves(self) :
+		state = self.state
+		piles = state.piles
+		hidden = state.hidden
+		moves = []
+		counts = state.suitCounts()
+		targets = self.foundTargets()
+
+		changed = True
+		while changed :
+			changed = False
+			for src in AUTO_SOURCES :
+				cards = piles[src]
+				if not cards : continue
+				if src < STOCK and len(cards) == hidden[src] :
+					move = engine.flip(src)
+					self.make(move)
+				else :
+					card = cards[-1]
+					if card not in targets or not self.isSafe(card, counts) : continue
+					move = engine.move(src, targets[card], 1)
+					self.make(move)
+					if src == WASTE and state.draw > 1 : self.pruned = True
+					counts[SUIT[card]] += 1
+					targets = self.foundTargets()
+				moves.append(move)
+				changed = True
+		self.counts = counts
+		self.targets = targets
+		return moves
+
+	#The number of cards the waste can be made to hold by drawing and recycling, with the moves it takes
+	#Drawing any number of cards in one go is the same as drawing them a few at a time (see expandDraws)
+	def talonReach(self) :
+		state = self.state
+		start = len(state.piles[WASTE])
+		total = start + len(state.piles[STOCK])
+		reach = []
+		if start : reach.append((start, []))
+
+		length = start
+		while length < total :
+			length = min(length + state.draw, total)
+			reach.append((length, [engine.move(STOCK, WASTE, length - start)]))
+
+		#Then recycle and go through the whole stock once more
+		if total and start and state.canRecycle() :
+			seen = set(length for length, draws in reach)
+			recycle = [engine.move(STOCK, WASTE, total - start)] if total > start else []
+			recycle.append(engine.move(WASTE, STOCK, total))
+			length = 0
+			while length < total :
+				length = min(length + state.draw, total)
+				if length not in seen : reach.append((length, recycle + [engine.move(STOCK, WASTE, length)]))
+		return reach
+
+	#The moves to try from the current state, best first
+	#Each candidate is a list of engine moves (turning up a card from the stock takes several)
+	def candidates(self) :
+		state = self.state
+		piles = state.piles
+		hidden = state.hidden
+		tops = [pile[-1] if pile else NONE for pile in piles]
+		counts = self.counts
+		onto = state.rules.onto
+		runs = state.rules.stack
+		starts = runs[NONE] #The cards that can go onto an empty column
+
+		empty = None #Kings only need to try one empty column, they are all the same
+		for col in range(STOCK) :
+			if not piles[col] :
+				empty = col
+				break
+
+		found = self.targets
+		#The tableau columns each card can go onto, kings (the cards that go onto an empty column) only to the first empty one
+		stack = {}
+		for col in range(STOCK) :
+			if piles[col] :
+				for card in onto[tops[col]] : stack.setdefault(card, []).append(col)
+		if empty is not None :
+			for card in onto[NONE] : stack.setdefault(card, []).append(empty)
+
+		to_found = []
+		uncover = []
+		talon = []
+		other = []
+		back = []
+
+		for src in range(STOCK) :
+			cards = piles[src]
+			if not cards : continue
+			if cards[-1] in found : to_found.append([engine.move(src, found[cards[-1]], 1)])
+
+			down = hidden[src]
+			for i in range(down, len(cards)) :
+				card = cards[i]
+				if card not in stack : continue
+				if i == 0 and empty is not None and starts[card] : continue #A king at the bottom gains nothing from an empty column
+				for dst in stack[card] :
+					if dst == src : continue
+					move = [src | dst << 4 | len(cards) - i << 8]
+					#Moves that turn up a facedown card or empty a column come first
+					if i == down : uncover.append((down, move))
+					elif cards[i - 1] in found or not runs[cards[i - 1]][card] : other.append(move) #(faceup cards need not be a run in Yukon)
+					else : self.pruned = True
+
+		#Every card that can be turned up from the stock, with the draws it takes to get there
+		#Read bottom of the waste to bottom of the stock, the cards keep their order however often they are drawn and recycled
+		#So which card is on top of the waste only depends on how many cards the waste holds
+		cycle = piles[WASTE] + piles[STOCK][ : : -1]
+		for length, draws in self.talonReach() :
+			card = cycle[length - 1]
+			if card in found : talon.append(draws + [engine.move(WASTE, found[card], 1)])
+			for dst in stack.get(card, ()) : talon.append(draws + [engine.move(WASTE, dst, 1)])
+
+		#Taking cards back off the foundations only helps if they could still be needed in the tableau
+		for src in range(FOUNDATION, PILES) :
+			card = tops[src]
+			if card == NONE or self.isSafe(card, counts) : continue
+			for dst in stack.get(card, ()) : back.append([engine.move(src, dst, 1)])
+
+		#The columns with the most facedown cards are dug into first
+		uncover.sort(key = lambda item : -item[0])
+		return to_found + [move for facedown, move in uncover] + talon + other + back
+
+
+#Split moves that draw many cards from the stock into the single draws a player makes
+def expandDraws(moves, draw) :
+	result = []
+	for move in moves :
+		num = engine.number(move)
+		if engine.source(move) != STOCK or num <= draw :
+			result.append(move)
+			continue
+		while num > 0 :
+			result.append(engine.move(STOCK, WASTE, min(draw, num)))
+			num -= draw
+	return result
+
+
+#Solve a deal in one go (see Solver for the arguments)
+def solve(position, max_nodes = 1000000, max_time = None, table_size = 1000000, memo = None) :
+	return Solver(position, max_nodes, max_time, table_size, memo).run()
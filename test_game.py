@@ -0,0 +1,87 @@
+#Checks the Game and its piles without a window (SDL's dummy video driver)
+#python -m pytest test_game.py
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import shutil
+import tempfile
+import unittest
+import pygame
+import abstract
+import game
+from general import SolSet
+
+class TestDirtyRects(unittest.TestCase) :
+	def setUp(self) :
+		self.dirty_rects = SolSet.dirty_rects
+		SolSet.dirty_rects = True
+		self.game = game.Game(3)
+		abstract.dirty.enabled = True
+
+	def tearDown(self) :
+		SolSet.dirty_rects = self.dirty_rects
+		abstract.dirty.enabled = False
+		abstract.dirty.rects = []
+
+	#Where a tile pile draws its card
+	def drawnAt(self, pile, card) :
+		return (pile.rect.x, pile.rect.y + pile.offsets[pile.cards.index(card)])
+
+	#A card turned over after the table was fitted to a new window size is marked where it is now drawn
+	def testFlipAfterResize(self) :
+		self.game.fitTable((1600, 1000))
+		self.game.draw()
+		pile = self.game.piles[6]
+		card = pile.cards[-2]
+		abstract.dirty.take()
+		card.faceUp = True
+		drawn = pygame.Rect(self.drawnAt(pile, card), card.rect.size)
+		self.assertTrue(any(rect.contains(drawn) for rect in abstract.dirty.take()))
+
+
+class TestScaledCache(unittest.TestCase) :
+	def setUp(self) :
+		self.dir = tempfile.mkdtemp()
+		self.scale_cache_dir = SolSet.scale_cache_dir
+		self.scale_cache_bytes = SolSet.scale_cache_bytes
+		abstract.scaled_cache = None #As in a process where no image was scaled yet
+
+	def tearDown(self) :
+		SolSet.scale_cache_dir = self.scale_cache_dir
+		SolSet.scale_cache_bytes = self.scale_cache_bytes
+		abstract.scaled_cache = None
+		shutil.rmtree(self.dir)
+
+	#The settings are read when the first image is scaled, not when abstract is imported
+	def testSettingsAfterImport(self) :
+		SolSet.scale_cache_dir = self.dir
+		played = game.Game(3)
+		played.fitTable((1600, 1000))
+		played.draw()
+		self.assertEqual(abstract.scaled_cache.directory, self.dir)
+		self.assertTrue(os.listdir(self.dir))
+
+	#Drawing a card uses its image, so the images dropped are the ones drawn least recently, and no card keeps one that was dropped
+	def testEviction(self) :
+		played = game.Game(3)
+		played.fitTable((1600, 1000))
+		width, height = abstract.scaledSize(SolSet.image_resolution)
+		SolSet.scale_cache_bytes = 10 * width * height * 4
+		abstract.scaled_cache = None
+		cards = played.cards
+		for card in cards :
+			card.faceUp = True
+			card.draw(played.screen)
+		cache = abstract.scaled_cache
+		self.assertLessEqual(cache.bytes, SolSet.scale_cache_bytes)
+		self.assertGreater(cache.evictions, 0)
+
+		first = cards[0]
+		first.draw(played.screen)
+		self.assertEqual(list(cache.images)[-1][1], first.image_name)
+		self.assertIs(first.image, cache.images[(SolSet.image_path, first.image_name, (width, height))])
+
+
+if __name__ == "__main__":
+	unittest.main()
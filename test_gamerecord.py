@@ -0,0 +1,160 @@
+#Checks that game records (see gamerecord.py) give back the games written to them
+#python -m pytest test_gamerecord.py
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import engine
+import gamerecord
+import variants
+
+#Play a game of variant on a WatchedKlondike watched by a GameWriter, a random legal move at a time with now and then a move taken back
+#Returns the keys of the positions after every op written, starting with the deal
+def playGame(path, variant, seed, num, interval = 8, buffered = True) :
+	rng = random.Random(seed)
+	state = variant.deal(engine.shuffled(seed), engine.WatchedKlondike)
+	writer = gamerecord.GameWriter(path, seed, state, interval, buffered, variant)
+	state.watchers.append(writer)
+	made = []
+	keys = [state.key()]
+	for i in range(num) :
+		moves = state.moves()
+		if made and (not moves or rng.random() < 0.15) : state.undo(made.pop())
+		elif moves :
+			made.append(rng.choice(moves))
+			state.apply(made[-1])
+		else : break
+		keys.append(state.key())
+	writer.close()
+	return keys
+
+
+class TestRoundTrip(unittest.TestCase) :
+	def setUp(self) :
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'game.sgr')
+
+	def tearDown(self) :
+		shutil.rmtree(self.dir)
+
+	def checkRecord(self, keys, variant) :
+		record = gamerecord.GameRecord(self.path)
+		try :
+			self.assertIs(record.variant, variant)
+			self.assertEqual(len(record), len(keys) - 1)
+			self.assertEqual([state.key() for num, state, move in record.positions()], keys)
+			for num in range(0, len(keys), 5) : self.assertEqual(record.position(num).key(), keys[num])
+		finally :
+			record.close()
+
+	def testVariants(self) :
+		for variant in variants.VARIANTS :
+			for seed in range(3) :
+				keys = playGame(self.path, variant, seed, 300)
+				self.checkRecord(keys, variant)
+
+	#Yukon moves cards that are not a run, so the number of cards moved cannot be worked out from the position
+	def testYukonGroups(self) :
+		yukon = variants.variant('yukon')
+		state = yukon.deal(engine.shuffled(1), engine.WatchedKlondike)
+		writer = gamerecord.GameWriter(self.path, 1, state, variant = yukon)
+		state.watchers.append(writer)
+		keys = [state.key()]
+		#Play until there is a move that a single byte would be read back wrong from
+		rng = random.Random(1)
+		for i in range(200) :
+			moves = state.moves()
+			tricky = [move for move in moves if engine.dest(move) < engine.STOCK and gamerecord.unpackMove(state, gamerecord.packMove(move)) != move]
+			state.apply(tricky[0] if tricky else rng.choice(moves))
+			keys.append(state.key())
+			if tricky : break
+		writer.close()
+		self.assertTrue(tricky)
+		self.checkRecord(keys, yukon)
+
+	def testVegasPasses(self) :
+		vegas = variants.variant('vegas')
+		state = vegas.deal(engine.shuffled(4), engine.WatchedKlondike)
+		writer = gamerecord.GameWriter(self.path, 4, state, 4, variant = vegas)
+		state.watchers.append(writer)
+		while state.drawMove() is not None : state.apply(state.drawMove())
+		writer.close()
+		record = gamerecord.GameRecord(self.path)
+		end = record.position(len(record))
+		record.close()
+		self.assertEqual(end.recycles, 2)
+		self.assertIsNone(end.drawMove())
+
+	#Undos that reach back past the checkpoint of their block, which have to look for the move they take back (see GameRecord.undone)
+	def testUndoAcrossCheckpoints(self) :
+		for variant in [variants.variant('klondike'), variants.variant('yukon')] :
+			rng = random.Random(2)
+			state = variant.deal(engine.shuffled(2), engine.WatchedKlondike)
+			writer = gamerecord.GameWriter(self.path, 2, state, 4, variant = variant)
+			state.watchers.append(writer)
+			keys = [state.key()]
+			made = []
+			for i in range(10) :
+				made.append(rng.choice(state.moves()))
+				state.apply(made[-1])
+				keys.append(state.key())
+			while made :
+				state.undo(made.pop())
+				keys.append(state.key())
+			for i in range(3) :
+				state.apply(rng.choice(state.moves()))
+				keys.append(state.key())
+			writer.close()
+			self.checkRecord(keys, variant)
+			record = gamerecord.GameRecord(self.path)
+			self.assertEqual([record.op(num) == record.undo_op for num in range(len(record))], [False] * 10 + [True] * 10 + [False] * 3)
+			self.assertEqual([move & gamerecord.UNDO for move in record.moves()], [0] * 10 + [gamerecord.UNDO] * 10 + [0] * 3)
+			record.close()
+
+	#A record cut off anywhere, also in the middle of a checkpoint or of a two byte move, reads as the moves that were written in full
+	def testCutOff(self) :
+		for variant in [variants.variant('klondike'), variants.variant('yukon')] :
+			keys = playGame(self.path, variant, 5, 40, 8, False)
+			with open(self.path, 'rb') as record : data = record.read()
+			full = gamerecord.GameRecord(self.path)
+			ends = [full.offset(num) + full.size for num in range(len(full))]
+			full.close()
+			for cut in range(gamerecord.HEADER.size + gamerecord.CHECKPOINT, len(data) + 1) :
+				with open(self.path, 'wb') as record : record.write(data[ : cut])
+				record = gamerecord.GameRecord(self.path)
+				try :
+					self.assertEqual(len(record), sum(1 for end in ends if end <= cut))
+					self.assertEqual(record.position(len(record)).key(), keys[len(record)])
+				finally :
+					record.close()
+
+	#Carrying on with a record that was cut off in the middle of the checkpoint after a full block
+	def testResume(self) :
+		klondike = variants.variant('klondike')
+		keys = playGame(self.path, klondike, 6, 16, 8, False)
+		with open(self.path, 'rb') as record : data = record.read()
+		record = gamerecord.GameRecord(self.path)
+		cut = record.offset(16) - gamerecord.CHECKPOINT // 2
+		record.close()
+		with open(self.path, 'wb') as record : record.write(data[ : cut])
+
+		writer = gamerecord.GameWriter.resume(self.path)
+		self.assertEqual(writer.count, 16)
+		self.assertEqual(writer.state.key(), keys[-1])
+		state = writer.state.copy()
+		rng = random.Random(6)
+		for i in range(12) :
+			move = rng.choice(state.moves())
+			state.apply(move)
+			writer.add(move)
+			keys.append(state.key())
+		writer.undo(move)
+		state.undo(move)
+		keys.append(state.key())
+		writer.close()
+		self.checkRecord(keys, klondike)
+
+
+if __name__ == "__main__":
+	unittest.main()
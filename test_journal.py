@@ -0,0 +1,126 @@
+#Checks taking back moves and making them again with a journal (see journal.py), in the engine, in a game record and on the table
+#python -m pytest test_journal.py
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import random
+import shutil
+import tempfile
+import unittest
+import engine
+import game
+import gamerecord
+import journal
+import variants
+
+#A deal of variant with a journal watching it
+def watched(variant, seed) :
+	state = variant.deal(engine.shuffled(seed), engine.WatchedKlondike)
+	moves = journal.Journal()
+	state.watchers.append(moves)
+	return state, moves
+
+#Make num random legal moves, returns the keys of the positions after each one, starting with the position before them
+def playRandom(state, num, rng) :
+	keys = [state.key()]
+	for i in range(num) :
+		state.apply(rng.choice(state.moves()))
+		keys.append(state.key())
+	return keys
+
+
+class TestJournal(unittest.TestCase) :
+	#Taking back every move goes through the positions backwards, making them again forwards
+	def testUndoRedo(self) :
+		for variant in variants.VARIANTS :
+			rng = random.Random(1)
+			state, moves = watched(variant, 1)
+			keys = playRandom(state, 60, rng)
+			for key in reversed(keys[ : -1]) :
+				state.undo(moves.last())
+				self.assertEqual(state.key(), key)
+			self.assertFalse(moves.canUndo())
+			self.assertIsNone(moves.last())
+			for key in keys[1 : ] :
+				state.apply(moves.next())
+				self.assertEqual(state.key(), key)
+			self.assertFalse(moves.canRedo())
+			self.assertIsNone(moves.next())
+
+	#Making the move that was taken back keeps the moves after it to redo, any other move forgets them
+	def testNewMove(self) :
+		state, moves = watched(variants.variant('klondike'), 2)
+		rng = random.Random(2)
+		playRandom(state, 5, rng)
+		first = moves.last()
+		state.undo(first)
+		state.undo(moves.last())
+		state.apply(moves.next())
+		self.assertEqual((moves.length, len(moves.moves), moves.next()), (4, 5, first))
+
+		other = [move for move in state.moves() if move != first][0]
+		state.apply(other)
+		self.assertEqual((moves.length, len(moves.moves), moves.last()), (5, 5, other))
+		self.assertFalse(moves.canRedo())
+
+
+#Undo and redo in a game written to a game record read back as the same game
+class TestRecorded(unittest.TestCase) :
+	def setUp(self) :
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'game.sgr')
+
+	def tearDown(self) :
+		shutil.rmtree(self.dir)
+
+	def testRecord(self) :
+		for variant in [variants.variant('klondike'), variants.variant('yukon')] :
+			rng = random.Random(3)
+			state, moves = watched(variant, 3)
+			writer = gamerecord.GameWriter(self.path, 3, state, 8, variant = variant)
+			state.watchers.append(writer)
+			keys = [state.key()]
+			for i in range(200) :
+				choice = rng.random()
+				if choice < 0.2 and moves.canUndo() : state.undo(moves.last())
+				elif choice < 0.35 and moves.canRedo() : state.apply(moves.next())
+				else : state.apply(rng.choice(state.moves()))
+				keys.append(state.key())
+			writer.close()
+
+			record = gamerecord.GameRecord(self.path)
+			try : self.assertEqual([position.key() for num, position, move in record.positions()], keys)
+			finally : record.close()
+
+
+#The table shows the position of the rules engine after every move taken back and made again
+class TestTable(unittest.TestCase) :
+	def checkTable(self, play) :
+		state = play.state
+		for pile in range(engine.PILES) :
+			cards = play.pileOf(pile).cards
+			self.assertEqual([card.code for card in cards], state.piles[pile])
+			if pile < engine.STOCK : hidden = state.hidden[pile]
+			elif pile == engine.STOCK : hidden = len(cards)
+			else : hidden = 0
+			self.assertEqual([card.faceUp for card in cards], [i >= hidden for i in range(len(cards))])
+
+	def testUndoRedo(self) :
+		play = game.Game(4)
+		rng = random.Random(4)
+		for i in range(40) :
+			move = rng.choice(play.state.moves())
+			play.state.apply(move)
+			play.showMove(move, False)
+		self.checkTable(play)
+		while play.journal.canUndo() :
+			play.undo()
+			self.checkTable(play)
+		while play.journal.canRedo() :
+			play.redo()
+			self.checkTable(play)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,87 @@
+#Checks that the position memo (see memo.py) finds a position whatever order its columns and foundations are in, with the moves turned round to match
+#python -m pytest test_memo.py
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import engine
+import memo
+import variants
+from engine import STOCK, FOUNDATION, PILES
+
+#Positions on the way through a deal of each variant, made with random moves (moves to the foundations first) so the foundations fill up
+def positions(seed, num) :
+	rng = random.Random(seed)
+	for variant in variants.VARIANTS :
+		state = variant.deal(engine.shuffled(seed))
+		for i in range(num) :
+			moves = state.moves()
+			if not moves : break
+			found = [move for move in moves if engine.dest(move) >= FOUNDATION]
+			state.apply(rng.choice(found or moves))
+			yield state.copy()
+
+#The same position with its columns and its foundations in another order, and the pile each pile of state went to
+def permuted(state, rng) :
+	piles = list(range(PILES))
+	columns = piles[ : STOCK]
+	foundations = piles[FOUNDATION : ]
+	rng.shuffle(columns)
+	rng.shuffle(foundations)
+	piles[ : STOCK] = columns
+	piles[FOUNDATION : ] = foundations
+	other = state.copy()
+	for pile, to in enumerate(piles) :
+		other.piles[to] = list(state.piles[pile])
+		if pile < STOCK : other.hidden[to] = state.hidden[pile]
+	return other, piles
+
+
+class TestMemo(unittest.TestCase) :
+	def setUp(self) :
+		self.dir = tempfile.mkdtemp()
+		self.memo = memo.Memo(os.path.join(self.dir, 'test.memo'), 4096)
+
+	def tearDown(self) :
+		self.memo.close()
+		shutil.rmtree(self.dir)
+
+	def hash(self, state) : return memo.positionHash(state, memo.columnOrder(state))
+
+	#Columns and foundations in any order hash the same, a move that changes more than the order of the piles changes the hash
+	def testPermuted(self) :
+		rng = random.Random(1)
+		for state in positions(1, 40) :
+			key = self.hash(state)
+			for i in range(3) : self.assertEqual(self.hash(permuted(state, rng)[0]), key)
+			for move in state.moves() :
+				state.apply(move)
+				if engine.number(move) < len(state.piles[engine.dest(move)]) : self.assertNotEqual(self.hash(state), key, engine.moveName(move))
+				state.undo(move)
+
+	#A move kept for a position comes back as the move of the same cards in the order the position is looked up in
+	def testLookupMove(self) :
+		rng = random.Random(2)
+		for state in positions(2, 25) :
+			other, piles = permuted(state, rng)
+			for move in state.moves() :
+				#An ace moved to another foundation leaves the canonical position as it was, so it is never a move worth keeping
+				if engine.source(move) >= FOUNDATION and engine.dest(move) >= FOUNDATION : continue
+				self.memo.record(state, memo.BEST, move)
+				entry = self.memo.lookup(other)
+				self.assertEqual(entry.kind, memo.BEST)
+				self.assertIn(entry.move, other.moves())
+				src = engine.source(move)
+				self.assertEqual(engine.source(entry.move), piles[src])
+				self.assertEqual(engine.number(entry.move), engine.number(move))
+
+				after = state.copy()
+				after.apply(move)
+				other.apply(entry.move)
+				self.assertEqual(self.hash(other), self.hash(after))
+				other.undo(entry.move)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,147 @@
+#Checks that a recorded session (see inputlog.py) replays to the same game (see replay.py)
+#python -m pytest test_replay.py
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pygame
+from pygame.locals import *
+import abstract
+import cardsets
+import engine
+import game
+import inputlog
+import replay
+from general import SolSet
+
+#The settings a test changes, put back afterwards
+SETTINGS = ['cardset_dir', 'image_path', 'image_type', 'image_resolution', 'image_back', 'frame_policy', 'target_fps', 'variant']
+
+#Raised when the scripted input runs out, which ends the game loop
+class EndOfScript(Exception) :
+	pass
+
+
+#Play a game through its game loop, frames is a list of functions that each give the events of a frame from the game as it is then
+#Returns all the events given
+def play(played, frames) :
+	frames = list(frames)
+	given = []
+	def events() :
+		if not frames : raise EndOfScript
+		frame = frames.pop(0)(played)
+		given.extend(frame)
+		return frame
+	with mock.patch('pygame.event.get', events) :
+		try : played.gameLoop()
+		except EndOfScript : pass
+	return given
+
+def click(pos) :
+	return [pygame.event.Event(MOUSEBUTTONDOWN, pos = pos, button = 1), pygame.event.Event(MOUSEBUTTONUP, pos = pos, button = 1)]
+
+def key(code) :
+	return [pygame.event.Event(KEYUP, key = code)]
+
+#Turn up the stock (wherever it is in the layout of the game)
+def drawCard(played) :
+	return click(played.piles[7].piles[0].rect.center)
+
+#Drag the cards of the first move the rules allow from anywhere but the stock, in steps of mouse motion
+def dragMove(played) :
+	piles = dict((pile.index, pile) for pile in played.piles[ : 7] + played.piles[7].piles + played.piles[-4 : ])
+	moves = [move for move in played.state.moves() if engine.source(move) != engine.STOCK and engine.dest(move) != engine.STOCK]
+	if not moves : return []
+	move = moves[0]
+	card = piles[engine.source(move)].cards[-engine.number(move)]
+	start = card.rect.center
+	end = piles[engine.dest(move)].dropRect().center
+	events = [pygame.event.Event(MOUSEBUTTONDOWN, pos = start, button = 1)]
+	for step in range(1, 9) :
+		pos = (start[0] + (end[0] - start[0]) * step // 8, start[1] + (end[1] - start[1]) * step // 8)
+		events.append(pygame.event.Event(MOUSEMOTION, pos = pos, rel = (pos[0] - events[-1].pos[0], pos[1] - events[-1].pos[1]), buttons = (1, 0, 0)))
+	events.append(pygame.event.Event(MOUSEBUTTONUP, pos = end, button = 1))
+	return events
+
+#Where the cards of every pile are drawn (a pile only puts its cards there when they are needed, see AbstractTilePile.place)
+def layout(played) :
+	piles = played.piles[ : 7] + played.piles[7].piles + played.piles[-4 : ]
+	for pile in piles : pile.place()
+	return [[tuple(card.rect) for card in pile.cards] for pile in piles]
+
+
+class TestReplay(unittest.TestCase) :
+	def setUp(self) :
+		self.settings = dict((name, getattr(SolSet, name)) for name in SETTINGS)
+		SolSet.frame_policy = 'fps'
+		SolSet.target_fps = 100000
+		self.dir = tempfile.mkdtemp()
+		self.log = os.path.join(self.dir, 'session.log')
+
+	def tearDown(self) :
+		for name, value in self.settings.items() : setattr(SolSet, name, value)
+		shutil.rmtree(self.dir)
+
+	#Two copies of the bundled cardset, the second one with bigger cards
+	def makeCardsets(self) :
+		small = os.path.join(self.dir, 'small')
+		big = os.path.join(self.dir, 'big')
+		shutil.copytree(self.settings['image_path'], small)
+		shutil.copytree(self.settings['image_path'], big)
+		config = os.path.join(big, 'config.txt')
+		with open(config) as lines : text = lines.read().split('\n')
+		text[1] = text[1].split(';')[0] + ';Zz big'
+		text[2] = '100 153 8'
+		with open(config, 'w') as lines : lines.write('\n'.join(text))
+		SolSet.cardset_dir = self.dir
+		cardsets.Cardset(small).select()
+
+	#Play frames while recording and then replay the log from the same cardset, the replay must end with the same game laid out the same way
+	#Returns the events that were played
+	def checkReplay(self, frames) :
+		first = SolSet.image_path
+		abstract.image_scale = 1.0 #Each game starts at the size of its cardset, as it does in a process of its own
+		played = game.Game(5, self.log)
+		start = played.state.key()
+		given = play(played, frames)
+		played.recorder.close()
+		self.assertNotEqual(played.state.key(), start)
+		ended = (played.state.key(), layout(played), SolSet.image_path)
+
+		cardsets.Cardset(first).select()
+		abstract.image_scale = 1.0
+		SolSet.variant = 'klondike' #The replay has to take the variant from the log
+		replayed = replay.ReplayGame(list(inputlog.readLog(self.log)))
+		replayed.replay()
+		self.assertEqual((replayed.state.key(), layout(replayed), SolSet.image_path), ended)
+		return given
+
+	#Switching cardset lays the table out again, so the input after it is only played back right if the switch is
+	def testSwitchCardset(self) :
+		self.makeCardsets()
+		self.checkReplay([drawCard, drawCard, lambda played : key(K_c), drawCard, dragMove, drawCard, dragMove])
+		self.assertEqual(SolSet.image_resolution, (100, 153))
+		self.assertIn(inputlog.CARDSET, [record.kind for record in inputlog.readLog(self.log)])
+
+	#Every step of a drag is logged, though the game merged them and moved the cards once a frame
+	def testDragInSteps(self) :
+		given = self.checkReplay([drawCard, dragMove, drawCard, dragMove, drawCard, dragMove])
+		motions = [(event.pos, event.rel) for event in given if event.type == MOUSEMOTION]
+		logged = [(record.data[ : 2], record.data[2 : ]) for record in inputlog.readLog(self.log) if record.kind == inputlog.MOTION]
+		self.assertGreater(len(motions), 8)
+		self.assertEqual(logged, motions)
+
+	#A session of another variant is replayed as that variant
+	def testVariant(self) :
+		for name in ['draw3', 'yukon'] :
+			SolSet.variant = name
+			self.checkReplay([drawCard, dragMove, drawCard, dragMove, dragMove])
+			self.assertEqual(SolSet.variant, name)
+
+
+if __name__ == "__main__":
+	unittest.main()
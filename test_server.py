@@ -0,0 +1,31 @@
+#Checks the table server (see server.py) over a real socket
+#python -m pytest test_server.py
+import asyncio
+import unittest
+import server
+
+#Start a server on a free port, send it lines and return its replies
+async def talk(lines) :
+	tables = server.Server(10)
+	listener = await asyncio.start_server(tables.serve, '127.0.0.1', 0)
+	port = listener.sockets[0].getsockname()[1]
+	reader, writer = await asyncio.open_connection('127.0.0.1', port)
+	writer.write(b''.join(line + b'\n' for line in lines))
+	replies = [(await reader.readline()).decode('ascii') for line in lines]
+	writer.close()
+	listener.close()
+	await listener.wait_closed()
+	return replies
+
+
+class TestServer(unittest.TestCase) :
+	#A request the server cannot read gets an error, and the tables of the connection are kept
+	def testBadRequests(self) :
+		replies = asyncio.run(talk([b'NEW 5', 'STATE é'.encode('utf-8'), b'MOVE 1 \xff', b'A' * 70000, b'STATE 1']))
+		self.assertTrue(replies[0].startswith('OK 1 5 1 '))
+		for reply in replies[1 : 4] : self.assertTrue(reply.startswith('ERR '), reply)
+		self.assertEqual(replies[4], replies[0])
+
+
+if __name__ == "__main__":
+	unittest.main()
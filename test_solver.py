@@ -0,0 +1,108 @@
+#Checks the verdicts of the solver (see solver.py) and that the wins it finds can be played
+#python -m pytest test_solver.py
+import random
+import unittest
+import engine
+import solver
+import variants
+from engine import CODES, STOCK, FOUNDATION
+
+#A position with the cards below rank found[suit] of each suit ('d', 'h', 'c', 's') on the foundations
+#columns are lists of card names from the bottom up, the first down[i] of column i facedown, and stock is the stock from the bottom up
+def position(found, columns, down, stock = (), draw = 1, passes = None) :
+	state = engine.Klondike(draw, passes = passes)
+	for i, suit in enumerate('dhcs') :
+		state.piles[FOUNDATION + i] = [CODES['%02d%s' % (rank, suit)] for rank in range(1, found[suit] + 1)]
+	for col, cards in enumerate(columns) :
+		state.piles[col] = [CODES[name] for name in cards]
+		state.hidden[col] = down[col]
+	state.piles[STOCK] = [CODES[name] for name in stock]
+	state.found = sum(found.values())
+	assert sorted(sum(state.piles, [])) == list(range(52))
+	return state
+
+#Every position that can be got to from state with the moves the rules allow, without leaving anything out as the solver does
+#Only for positions small enough to go through completely
+def reachable(state) :
+	seen = set([state.key()])
+	todo = [state]
+	while todo :
+		state = todo.pop()
+		yield state
+		for move in state.moves() :
+			after = state.copy()
+			after.apply(move)
+			key = after.key()
+			if key not in seen :
+				seen.add(key)
+				todo.append(after)
+
+#Hearts and spades from 8 up and the top clubs are left, each tableau card waits for one under a card in another column
+#Nothing can come back off the foundations and there is no empty column for a king, so only the stock can be gone through, over and over
+DEADLOCK = dict(
+	found = {'d' : 13, 'h' : 7, 'c' : 9, 's' : 7},
+	columns = [['08s', '09h'], ['08h', '09s'], ['10s', '11h'], ['10h', '11s'], ['12s', '13h'], ['12h', '13s'], ['10c', '12c', '13c']],
+	down = [1, 1, 1, 1, 1, 1, 2],
+	stock = ['11c'])
+
+#The same with the first column the other way up: its 8 goes up and everything follows from it, by way of kings going to empty columns,
+#a jack going onto a queen and the king of diamonds coming back off the foundations for the queen of clubs to go onto
+UNLOCKED = dict(DEADLOCK, columns = [['09h', '08s']] + DEADLOCK['columns'][1 : ])
+
+
+class TestSolver(unittest.TestCase) :
+	#A win the solver found must be a list of legal moves (draws included) from the position searched that wins it
+	def checkWin(self, state, result) :
+		self.assertEqual(result.verdict, solver.WINNABLE)
+		state = state.copy()
+		for move in result.moves :
+			self.assertIn(move, state.moves(), engine.moveName(move))
+			state.apply(move)
+		self.assertTrue(state.won())
+
+	def testDeadlock(self) :
+		state = position(**DEADLOCK)
+		self.assertFalse(any(state.won() for state in reachable(state.copy())))
+		self.assertEqual(solver.solve(state).verdict, solver.UNWINNABLE)
+
+	def testUnlocked(self) :
+		state = position(**UNLOCKED)
+		self.checkWin(state, solver.solve(state))
+
+	#The wins found for deals of every variant play out (some of the first deals of each are won within a small budget)
+	def testDeals(self) :
+		for variant in variants.VARIANTS :
+			won = 0
+			for seed in range(12) :
+				state = variant.deal(engine.shuffled(seed))
+				result = solver.solve(state, 20000)
+				if result.verdict == solver.WINNABLE :
+					self.checkWin(state, result)
+					won += 1
+			self.assertGreater(won, 0, variant.name)
+
+	#The key kept up to date a move at a time is the one worked out from scratch, and does not depend on the order of the columns
+	def testKey(self) :
+		rng = random.Random(5)
+		for variant in variants.VARIANTS :
+			search = solver.Solver(variant.deal(engine.shuffled(5)), 1000)
+			made = []
+			for i in range(300) :
+				moves = search.state.moves()
+				if made and (not moves or rng.random() < 0.3) : search.unmake(made.pop())
+				else :
+					move = rng.choice(moves)
+					search.make(move)
+					made.append(move)
+				self.assertEqual(search.key, search.stateKey())
+
+			state = search.state
+			order = list(range(STOCK))
+			rng.shuffle(order)
+			state.piles[ : STOCK] = [state.piles[col] for col in order]
+			state.hidden = [state.hidden[col] for col in order]
+			self.assertEqual(search.stateKey(), search.key)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,96 @@
+#The solitaire games the rules engine can deal, each a layout of the tableau, a way of going through the stock and a Rules (see engine.py)
+#python variants.py                  the variants and how they are dealt
+#python variants.py --tables         and how many cards each card of each set of rules takes
+#The rules are compiled into their tables once, when this module is loaded, and a game only ever looks them up
+#	klondike   draw one card at a time, going through the stock as often as wanted
+#	draw3      draw three cards at a time
+#	vegas      draw three cards at a time, going through the stock only three times
+#	yukon      no stock: all the cards are dealt to the columns, and any faceup card can be moved with the cards on top of it
+#Yukon builds and founds like Klondike (the engine already moves any faceup card with the cards above it), only its deal is different
+#FREECELL and SPIDER are the rules of games that need piles the engine does not have (free cells, ten columns of two decks),
+#so they are compiled for search code to use but cannot be dealt yet
+import argparse
+import sys
+import engine
+from engine import RANK, SUIT, COLOR, NONE, KING, STOCK, Rules
+
+#Any card can go onto an empty column, otherwise the next lower card of the other color
+def freeCellStack(below, above) :
+	if below == NONE : return True
+	return RANK[below] == RANK[above] + 1 and COLOR[below] != COLOR[above]
+
+#Any card can go onto an empty column, otherwise the next lower card of any suit
+def spiderStack(below, above) :
+	if below == NONE : return True
+	return RANK[below] == RANK[above] + 1
+
+#A whole suit goes off at once, from the king down to the ace, so it is taken as being put onto its foundation one card at a time in that order
+def spiderFound(top, card) :
+	if top == NONE : return RANK[card] == KING
+	return RANK[top] == RANK[card] + 1 and SUIT[top] == SUIT[card]
+
+KLONDIKE = engine.KLONDIKE
+FREECELL = Rules('freecell', freeCellStack, engine.canFound)
+SPIDER = Rules('spider', spiderStack, spiderFound)
+
+RULES = [KLONDIKE, FREECELL, SPIDER]
+
+
+#How a game is dealt and played: columns[i] cards go to column i with hidden[i] of them facedown, the rest of the cards go to the stock
+#draw and passes are those of engine.Klondike
+#runs says the faceup cards of a column are always a run, so only one of them can be the first card of a move onto a column
+class Variant(object) :
+	def __init__(self, name, rules, draw = 1, passes = None, columns = range(1, 8), hidden = range(7), runs = True) :
+		self.name = name
+		self.rules = rules
+		self.draw = draw
+		self.passes = passes
+		self.columns = list(columns)
+		self.hidden = list(hidden)
+		self.runs = runs
+
+	def __repr__(self) : return 'Variant(' + self.name + ')'
+
+	def stock(self) : return 52 - sum(self.columns)
+
+	#Deal the card codes into a new state of cls (an engine.Klondike or a subclass)
+	def deal(self, codes, cls = engine.Klondike) :
+		state = cls(self.draw, self.rules, self.passes)
+		marker = 0
+		for col in range(STOCK) :
+			state.piles[col] = list(codes[marker : marker + self.columns[col]])
+			state.hidden[col] = self.hidden[col]
+			marker += self.columns[col]
+		state.piles[STOCK] = list(codes[marker : ])
+		return state
+
+
+VARIANTS = [
+	Variant('klondike', KLONDIKE),
+	Variant('draw3', KLONDIKE, draw = 3),
+	Variant('vegas', KLONDIKE, draw = 3, passes = 3),
+	Variant('yukon', KLONDIKE, columns = [1, 6, 7, 8, 9, 10, 11], hidden = range(7), runs = False),
+]
+
+NAMES = [variant.name for variant in VARIANTS]
+
+def variant(name) :
+	for known in VARIANTS :
+		if known.name == name : return known
+	raise ValueError('no variant called ' + name + ', there are ' + ', '.join(NAMES))
+
+
+def parseArgs(argv) :
+	parser = argparse.ArgumentParser(description = 'List the solitaire variants and their rules')
+	parser.add_argument('--tables', action = 'store_true', help = 'count the cards each card of each set of rules takes')
+	return parser.parse_args(argv)
+
+if __name__ == "__main__":
+	args = parseArgs(sys.argv[1 : ])
+	for known in VARIANTS :
+		print('%-10s rules %-10s draw %d, %s, columns %s, %d in the stock' % (known.name, known.rules.name, known.draw,
+			'any number of passes' if known.passes is None else '%d passes' % known.passes, ' '.join(map(str, known.columns)), known.stock()))
+	if args.tables :
+		for rules in RULES :
+			print('%-10s %4d ways to build, %4d ways to found, an empty column takes %d cards' % (rules.name,
+				sum(map(sum, rules.stack[ : 52])), sum(map(sum, rules.found[ : 52])), sum(rules.stack[NONE])))